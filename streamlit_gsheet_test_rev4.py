@@ -4,10 +4,15 @@ from streamlit_option_menu import option_menu
 from streamlit_gsheets import GSheetsConnection 
 import gspread
 from google.oauth2.service_account import Credentials
+from google.auth.exceptions import GoogleAuthError
 import pandas as pd
 import numpy as np
-import io, os
+import pyarrow as pa
+from PIL import Image, ImageOps
+import io, os, re, csv, time, hashlib, tempfile, threading
 import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests as rq
 from pandas.tseries.offsets import MonthEnd
 from sqlalchemy import create_engine, text
@@ -176,7 +181,9 @@ st.markdown("""
 # --- 공통 연결 객체 및 함수 ---
 conn = st.connection("gsheets", type=GSheetsConnection)
 
+@st.cache_resource
 def get_gspread_client():
+    """서비스 계정 인증은 프로세스당 한 번 (재실행마다 키 파일을 다시 읽지 않음)"""
     scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
     # 기존에 사용하시던 JSON 키 경로를 그대로 입력하세요.
     SERVICE_ACCOUNT_FILE = r'K:/pyenv/py311/py_gsheet/python-gsheet-484713-be4d9602c973.json'
@@ -184,35 +191,769 @@ def get_gspread_client():
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
     return gspread.authorize(creds)
 
-def style_fill_col(col):    
-    style = ['' for _ in col]    
-    if col.name in ['계약(%)','완납(%)','소송(%)']:
-        #style = ['background-color: yellow' for _ in col]
-        style = ['color: yellow' for _ in col] # 컬럼명이 '계약(%)'인 경우에만 노란색 또는 배경 적용
-    return style
-
-def style_fill_row(row):
-    name = row.name #해당 row(행)의 인덱스(Index) 이름    
-    #isinstance(name, tuple): 만약 인덱스가 멀티 인덱스라면 ('대분류', '항목명')처럼 튜플(Tuple) 형태가 됩니다.
-    #이 경우 name[1]을 선택해 실제 항목명인 '항목명'만 가져옵니다.
-    item_name = name[1] if isinstance(name, tuple) else name        
-    if item_name in ['영업이익','원가율','경상이익','소계','과부족']:
-        return ['background-color: black'] * len(row)    
-    return [''] * len(row)
-    #조건에 맞지 않으면: 빈 문자열('')을 반환하여 기본 스타일을 유지합니다.
-    # * len(row)를 하는 이유는 행의 모든 칸(Cell) 개수만큼 스타일 정보를 리스트로 전달해야 하기 때문입니다.
-def style_by_date(col):
-    # 컬럼 이름이 '상품'이나 '구분'이면 스타일 적용 안 함
-    if col.name in ['상품', '구분']:
-        return [''] * len(col)            
+
+# --- 공용 데이터셋 캐시 ---
+# 모든 메뉴의 구글시트 조회는 load_sheet()를 거친다.
+# 세션 간 공유되며 데이터셋별 TTL, 전체 메모리 상한(LRU 제거), 명시적 무효화를 지원한다.
+SHEET_CACHE_MAX_MB = 512
+SHEET_STALE_MAX = 24 * 3600  # 만료 후 이 시간 동안은 오래된 값을 보여주며 백그라운드에서 갱신
+
+def sheet_url(key, gid=0):
+    return f"https://docs.google.com/spreadsheets/d/{key}/edit?gid={gid}#gid={gid}"
+
+ALV_BASE_COLS = ['프로젝트', '프로젝트 내역', '기준월']
+DONGHO_COLS = ['동', '호수', '세대속성', '주택형', '약정일자', '차수', '약정금액', '납부원금']  # 동호약정_<현장> 공통
+SCHEDULE_DATES = [f'일정{i}' for i in range(1, 13)]
+SCHEDULE_NAMES = [f'일정명{i}' for i in range(1, 13)]
+SCHEDULE_COLS = ['사업명'] + SCHEDULE_DATES + SCHEDULE_NAMES
+
+SHEETS = {
+    # 이름: 스프레드시트 키, gid, TTL(초), 컬럼 투영(columns/exclude/range, 아래 '컬럼 투영' 참고)
+    # delta: 행 해시 비교로 변경분만 병합하는 대용량 시트 (적재 가공은 변경 행에만 적용)
+    '사업개요':        {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 0, 'ttl': 3600, 'range': 'A:O'},
+    '추진일정':        {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 0, 'ttl': 3600, 'columns': SCHEDULE_COLS},
+    '중도금결산':      {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 67742981, 'ttl': 1800,
+                       'columns': ['사업명', '상품유형', '대출기관', '잔액', '대출만기일']},
+    '분양':            {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 391839077, 'ttl': 600, 'delta': True,
+                       'columns': ['사업명', '상품', '동호수', '계약여부', '계약여부2', '완납여부', '소송',
+                                   '총분양금', '입주증번호', '계약월', '완납월']},
+    '입주예정':        {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 1029648553, 'ttl': 21600,
+                       'columns': ['구분', '시도', '단지명', '소재지', '세대수', '기준월', '기준년']},
+    '인구':            {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 1726816395, 'ttl': 21600, 'exclude': ['행정기관코드']},
+    '미분양':          {'key': '1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A', 'gid': 667956721, 'ttl': 21600, 'exclude': ['항목', '단위']},
+    'PF현황':          {'key': '1G4GJIXw36pKUoPgAR2I8yQ0zcTKoscwAoNW5nu7oNPI', 'gid': 0, 'ttl': 1800, 'range': 'A:H,L:M,O'},
+    '자금수지':        {'key': '18AhC-xVCGMpapdZwpptxnkED3_sO18B7qDeKz-4oa60', 'gid': 0, 'ttl': 1800,
+                       'columns': ['수지구분', '사업명', '기준월', '구분', '집행월', '금액']},
+    '채권':            {'key': '1RlNYrWWezvHQfceEgmHIkC-c7dnIxRIWZTM3fWdqDWQ', 'gid': 0, 'ttl': 1800},
+    '소송':            {'key': '1diNe5cD5pFtz9ca7c4z5leUsbUTPgAPMM7fFmjFOczQ', 'gid': 1053819147, 'ttl': 3600,
+                       'columns': ['사업명', '판결여부', '소송규모', '사건명', '접수일', '원고', '기일차수', '최종일자', '원고수']},
+    '동호약정_벤처밸리': {'key': '1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM', 'gid': 0, 'ttl': 600, 'delta': True,
+                       'columns': DONGHO_COLS},
+    '동호약정_시민공원': {'key': '1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM', 'gid': 767298303, 'ttl': 600, 'delta': True,
+                       'columns': DONGHO_COLS},
+    '동호약정_시화디오션': {'key': '1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM', 'gid': 1762659893, 'ttl': 600, 'delta': True,
+                       'columns': DONGHO_COLS},
+    '중도금_서면':     {'key': '1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E', 'gid': 943639489, 'ttl': 1800},
+    '중도금_트라반트': {'key': '1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E', 'gid': 453535398, 'ttl': 1800},
+    '중도금_시민공원': {'key': '1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E', 'gid': 668236831, 'ttl': 1800},
+    'alv':             {'key': '1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM', 'gid': 0, 'ttl': 1800, 'delta': True},
+    'pj_pair':         {'key': '1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM', 'gid': 1549480112, 'ttl': 300,
+                       'columns': ['pj', 'pjo']},
+}
+
+# --- 데이터셋 스키마 ---
+# 적재 시점에 한 번만 형 변환하고, 메뉴에서는 변환된 프레임을 그대로 사용한다.
+#   numeric : 콤마 제거 후 숫자, 결측 0 (정수로 표현되면 정수형). '*'는 다른 항목에 선언되지 않은 나머지 전부
+#   date    : 날짜 (변환 불가는 NaT)
+#   category: 반복되는 키 (메모리 절감, 집계 시 observed=True)
+#   text    : 문자열 (결측은 유지하고 나머지 값은 str로 통일)
+#   replace : 값 표준화 {컬럼: {원래값: 바꿀값}} (category 변환 전에 적용)
+#   compact : 적재 후 값 범위에 맞는 가장 작은 정수형으로 줄일 컬럼 ('*'는 정수 컬럼 전부, compact_frame)
+#             정수 금액/건수가 있는 데이터셋은 모두 지정. 캐시/스냅샷에만 작은 형으로 두고, 메뉴용 사본(load_sheet)과
+#             파생 집계는 widen_ints로 int64로 되돌린 뒤 계산한다. (작은 정수형끼리의 원소별 계산은 넘쳐도 오류가 없음)
+SCHEMAS = {
+    'PF현황':     {'numeric': ['약정', '기표', '상환', '잔액'], 'category': ['PJ명', '기준월'], 'compact': '*'},
+    '자금수지':   {'numeric': ['금액'], 'date': ['집행월'], 'category': ['수지구분', '사업명', '기준월'], 'compact': '*'},
+    '채권':       {'numeric': ['채권', '불량', '잔액', '총분양금', '대출잔액'], 'category': ['손익센터명', '기준월'],
+                   'compact': '*'},
+    '중도금결산': {'numeric': ['잔액'], 'compact': '*'},
+    '중도금_서면':     {'numeric': ['대출잔액'], 'compact': '*'},
+    '중도금_트라반트': {'numeric': ['대출잔액'], 'compact': '*'},
+    '중도금_시민공원': {'numeric': ['대출잔액'], 'compact': '*'},
+    '분양':       {'numeric': ['입주증번호', '총분양금'], 'date': ['계약월', '완납월'],
+                   'category': ['사업명', '상품', '계약여부', '완납여부', '소송', '계약여부2'], 'text': ['동호수'],
+                   'compact': '*'},
+    '입주예정':   {'numeric': ['세대수', '기준년'], 'category': ['구분', '시도'],
+                   'replace': {'시도': {'강원특별자치도': '강원도'}}, 'compact': '*'},
+    '인구':       {'numeric': ['총인구수', '세대수', '남자 인구수', '여자 인구수'], 'category': ['기준월'], 'compact': '*'},
+    '미분양':     {'numeric': '*', 'category': ['구분', '시군구'], 'compact': '*'},
+    'alv':        {'numeric': '*', 'text': ALV_BASE_COLS, 'compact': '*'},
+    'pj_pair':    {'text': ['pj', 'pjo']},
+    '추진일정':   {'date': SCHEDULE_DATES, 'text': SCHEDULE_NAMES},
+    **{name: {'numeric': ['약정금액', '납부원금'], 'date': ['약정일자'], 'text': ['세대속성', '주택형', '차수'],
+              'compact': '*'}
+       for name in SHEETS if name.startswith('동호약정_')},
+}
+
+def to_number(s):
+    """콤마가 섞인 숫자 문자열을 숫자로 변환 (변환 불가/결측은 0). 소수가 없으면 정수형"""
+    if not pd.api.types.is_numeric_dtype(s):
+        s = pd.to_numeric(s.astype(str).str.replace(',', '', regex=False), errors='coerce')
+    s = s.fillna(0)
+    if s.dtype.kind == 'f' and (s % 1 == 0).all():
+        s = s.astype('int64')
+    return s
+
+def parse_rows(df, schema):
+    """스키마의 행 단위 변환(numeric/date/text). 델타 동기화 시 변경 행에만 적용된다."""
+    df = df.copy()
+    declared = {c for kind in ('date', 'category', 'text') for c in schema.get(kind, [])}
+    numeric = schema.get('numeric', [])
+    if numeric == '*':
+        numeric = [c for c in df.columns if c not in declared and c != ROW_HASH]
+    for col in numeric:
+        if col in df.columns:
+            df[col] = to_number(df[col])
+    for col in schema.get('date', []):
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in schema.get('text', []):
+        if col in df.columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    for col, mapping in schema.get('replace', {}).items():
+        if col in df.columns:
+            df[col] = df[col].replace(mapping)
+    return df
+
+def compact_frame(df, schema):
+    """반복 키는 category, compact로 선언한 정수는 가장 작은 정수형으로 (병합 후 전체 프레임 기준으로 적용)"""
+    for col in schema.get('category', []):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    compact = schema.get('compact', [])
+    if compact == '*':
+        compact = df.select_dtypes(include='integer').columns
+    for col in compact:
+        if col != ROW_HASH and col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+def widen_ints(obj):
+    """compact로 줄인 정수형을 int64로 되돌린다 (Series/DataFrame, 해당 컬럼이 없으면 그대로).
+    groupby 합계도 결과가 들어가면 작은 정수형을 유지하므로, 원소별 계산 전에 거친다."""
+    if isinstance(obj, pd.Series):
+        return obj.astype('int64') if pd.api.types.is_integer_dtype(obj.dtype) and obj.dtype != 'int64' else obj
+    small = {col: 'int64' for col, dtype in obj.dtypes.items()
+             if pd.api.types.is_integer_dtype(dtype) and dtype != 'int64'}
+    return obj.astype(small) if small else obj
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+RAW_BYTES = 'raw_bytes'  # 스냅샷(attrs)에 함께 저장하는 시트 원본 크기
+
+@st.cache_resource
+def memory_report():
+    """데이터셋별 {'원본': 시트에서 받은 그대로의 크기, '압축': 적재 가공 후 크기} (바이트)"""
+    return {}
+
+def record_memory(name, df):
+    """메모리 보고 갱신. 원본 크기는 시트에서 받을 때 재서 스냅샷에 함께 저장한 값 (없으면 None)"""
+    memory_report()[name] = {'원본': df.attrs.get(RAW_BYTES), '압축': frame_bytes(df.drop(columns=ROW_HASH, errors='ignore'))}
+
+def memory_report_frame():
+    mb = lambda n: None if n is None else round(n / 1024**2, 2)
+    rows = [{'데이터셋': name, '원본(MB)': mb(m['원본']), '압축(MB)': mb(m['압축']),
+             '절감(%)': round((1 - m['압축'] / m['원본']) * 100) if m['원본'] else None}
+            for name, m in memory_report().items()]
+    return pd.DataFrame(rows)
+
+
+class SheetCache:
+    """데이터셋 공용 캐시 (데이터셋별 TTL + 메모리 상한 LRU, 만료 후 일정 시간은 오래된 값 제공)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._entries = OrderedDict()  # 이름 -> {'df', 'loaded_at', 'as_of', 'expires_at', 'nbytes', 'source', 'version'}
+        self._lock = threading.RLock()
+        self._version = 0  # put마다 증가 (파생 항목을 만드는 동안 원본이 바뀌었는지 확인용)
+        self._loading = {}  # 이름 -> 적재 잠금 (동시 미스 시 한 번만 받도록)
+
+    def lookup(self, name):
+        """(df, 만료여부). 없거나 만료 후 SHEET_STALE_MAX가 지났으면 (None, False)"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None, False
+            now = time.time()
+            if now >= entry['expires_at'] + SHEET_STALE_MAX:
+                self._drop(name)
+                return None, False
+            self._entries.move_to_end(name)  # 최근 사용 표시
+            return entry['df'], now >= entry['expires_at']
+
+    def get(self, name):
+        """만료되지 않은 값만 반환"""
+        df, stale = self.lookup(name)
+        return None if stale else df
+
+    def info(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            return {'as_of': entry['as_of'], 'stale': time.time() >= entry['expires_at']}
+
+    def version(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return None if entry is None else entry['version']
+
+    def put(self, name, df, ttl, source=None, as_of=None):
+        """저장하고 새 버전을 돌려준다"""
+        nbytes = frame_bytes(df)
+        now = time.time()
+        with self._lock:
+            self._drop(name)
+            self._version += 1
+            self._entries[name] = {'df': df, 'loaded_at': now, 'as_of': as_of or now, 'expires_at': now + ttl,
+                                   'nbytes': nbytes, 'source': source, 'version': self._version}
+            self.used_bytes += nbytes
+            # 이 항목에서 (여러 단계로) 파생된 항목은 다음 조회 때 새 값으로 다시 만들도록 만료 처리
+            self._expire(self._dependents(name), now)
+            # 상한 초과 시 가장 오래 사용되지 않은 항목부터 제거 (방금 넣은 항목은 유지)
+            while self.used_bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+            return self._version
+
+    def expire(self, name):
+        """값은 남겨 둔 채 name과 그 파생 항목을 만료 처리 (다음 조회 때 백그라운드에서 다시 만듦)"""
+        with self._lock:
+            if name in self._entries:
+                self._expire([name, *self._dependents(name)], time.time())
+
+    def _expire(self, keys, now):
+        for key in keys:
+            self._entries[key]['expires_at'] = min(self._entries[key]['expires_at'], now)
+
+    def loading_lock(self, name):
+        with self._lock:
+            return self._loading.setdefault(name, threading.Lock())
+
+    def invalidate(self, name=None):
+        """name 미지정 시 전체, 지정 시 해당 데이터셋과 그로부터 파생된 항목을 제거"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self.used_bytes = 0
+                return
+            for key in [name, *self._dependents(name)]:
+                self._drop(key)
+
+    def _dependents(self, name):
+        """name에서 파생된 항목과 그 항목에서 다시 파생된 항목 전부 (잠금 안에서 호출)"""
+        found, frontier = set(), {name}
+        while frontier:
+            frontier = {k for k, e in self._entries.items()
+                        if k not in found and k != name and frontier.intersection(source_names(e['source']))}
+            found |= frontier
+        return found
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            rows = [{'데이터셋': k,
+                     '메모리(MB)': round(e['nbytes'] / 1024**2, 2),
+                     '기준시각': datetime.datetime.fromtimestamp(e['as_of']).strftime('%m-%d %H:%M'),
+                     '남은TTL(초)': max(0, int(e['expires_at'] - now))}
+                    for k, e in self._entries.items()]
+        return pd.DataFrame(rows)
+
+    def _drop(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self.used_bytes -= entry['nbytes']
+
+
+def source_names(source):
+    """파생 항목의 원본 이름들 (source는 이름 하나 또는 여러 이름의 tuple)"""
+    if source is None:
+        return ()
+    return source if isinstance(source, tuple) else (source,)
+
+
+@st.cache_resource
+def get_sheet_cache():
+    return SheetCache(SHEET_CACHE_MAX_MB * 1024**2)
+
+# 백그라운드 갱신 중인 스레드의 상태: seen = 빌더가 읽은 항목 -> 읽을 때의 버전 (갱신 중이 아니면 None)
+REBUILD_STATE = threading.local()
+
+def rebuilding():
+    return getattr(REBUILD_STATE, 'seen', None) is not None
+
+def cached_frame(name, builder, ttl, source=None, as_of=None):
+    """공용 캐시에서 name을 찾고, 없으면 builder()로 만들어 저장한다.
+    만료된 값은 데이터셋/파생 항목 모두 그대로 돌려주고 백그라운드에서 다시 만들어 교체한다. (stale-while-revalidate)
+    백그라운드 갱신 중에 빌더가 만난 만료 항목(중간 단계 파생 등)은 그 스레드에서 바로 다시 만들어
+    파생 항목이 오래된 원본으로 만들어지지 않게 한다.
+    as_of: 데이터 기준시각을 돌려주는 함수 (미지정 시 source의 기준시각 또는 적재 시각)"""
+    cache = get_sheet_cache()
+    version = cache.version(name)
+    df, stale = cache.lookup(name)
+    if df is None:
+        with cache.loading_lock(name):
+            version = cache.version(name)
+            df, stale = cache.lookup(name)  # 대기 중 다른 스레드(프리페치 등)가 적재했으면 그대로 사용
+            if df is None:
+                df = builder()
+                version, stale = store_frame(name, df, ttl, source, as_of), False
+    if stale and rebuilding():
+        df, version = rebuild_frame(name, builder, ttl, source, as_of, wait=True)
+    elif stale:
+        get_prefetch_executor().submit(rebuild_frame, name, builder, ttl, source, as_of)
+    if rebuilding():
+        REBUILD_STATE.seen[name] = version
+    return df
+
+def store_frame(name, df, ttl, source=None, as_of=None):
+    """저장하고 새 버전을 돌려준다"""
+    cache = get_sheet_cache()
+    if as_of is not None:
+        as_of = as_of()
+    else:
+        infos = [info for info in map(cache.info, source_names(source)) if info]
+        as_of = min((info['as_of'] for info in infos), default=None)  # 원본이 여럿이면 가장 오래된 기준
+    return cache.put(name, df, ttl, source=source, as_of=as_of)
+
+def rebuild_frame(name, builder, ttl, source=None, as_of=None, wait=False):
+    """만료 항목 갱신. 완료되면 캐시 항목을 한 번에 교체하고 (df, 버전)을 돌려준다.
+    백그라운드 작업(wait=False)은 이미 누가 적재 중이면 건너뛴다(None).
+    만드는 동안 빌더가 읽은 항목이 다른 스레드에서 바뀌었거나 (원본 갱신으로) 만료됐으면
+    결과를 만료 상태로 두어 다음 조회 때 다시 만든다."""
+    cache = get_sheet_cache()
+    lock = cache.loading_lock(name)
+    if not lock.acquire(blocking=wait):
+        return None
+    outer, REBUILD_STATE.seen = getattr(REBUILD_STATE, 'seen', None), {}
     try:
-        # 컬럼명(약정월)을 날짜 객체로 변환
-        col_date = pd.to_datetime(col.name)
-        # 전월 말일보다 작거나 같으면 회색(#9E9E9E), 아니면 검정색
-        color = 'color: #9E9E9E;' if col_date <= threshold_date else 'color: white;'
-        return [color] * len(col)
-    except:
-        return [''] * len(col)
+        version = cache.version(name)
+        df, stale = cache.lookup(name)
+        if df is None or stale:
+            df = builder()
+            version = store_frame(name, df, ttl, source, as_of)
+            if any(cache.version(key) != seen or cache.info(key)['stale'] for key, seen in REBUILD_STATE.seen.items()):
+                cache.expire(name)
+        return df, version
+    finally:
+        REBUILD_STATE.seen = outer
+        lock.release()
+
+def show_as_of(*names):
+    """조회 데이터의 기준시각 표시 (여러 데이터셋이면 가장 오래된 시각)"""
+    cache = get_sheet_cache()
+    infos = [info for info in map(cache.info, names) if info]
+    if not infos:
+        return
+    as_of = datetime.datetime.fromtimestamp(min(info['as_of'] for info in infos))
+    note = " · 최신 데이터로 갱신 중" if any(info['stale'] for info in infos) else ""
+    st.caption(f"🕒 데이터 기준: {as_of:%Y-%m-%d %H:%M}{note}")
+
+# --- 컬럼 투영 ---
+# 데이터셋마다 실제로 쓰는 컬럼만 시트에 요청한다. (SHEETS 항목)
+#   columns: 필요한 컬럼명, exclude: 제외할 컬럼명
+#   range  : A1 열 범위 ('A:H,L:M,O') - 컬럼 전체를 그대로 보여주는 시트용
+# 컬럼명은 시트 헤더와 대조하여 없으면 오류를 낸다.
+PROJECTION_KEYS = ('columns', 'exclude', 'range')
+
+def col_letter(pos):
+    """0 기준 열 번호 -> A1 열 문자 (0 -> A, 26 -> AA)"""
+    letters = ''
+    pos += 1
+    while pos:
+        pos, rem = divmod(pos - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def col_position(letters):
+    pos = 0
+    for ch in letters.strip().upper():
+        pos = pos * 26 + ord(ch) - 64
+    return pos - 1
+
+def range_positions(a1):
+    """'A:H,L:M,O' -> [0, ..., 7, 11, 12, 14]"""
+    positions = []
+    for part in a1.split(','):
+        start, _, end = part.partition(':')
+        positions += range(col_position(start), col_position(end or start) + 1)
+    return positions
+
+def projected_positions(name, header):
+    """헤더 기준으로 받아야 할 열 번호 (투영이 없으면 None)"""
+    spec = SHEETS[name]
+    if 'range' in spec:
+        positions = range_positions(spec['range'])
+        if positions[-1] >= len(header):
+            raise KeyError(f"{name}: 시트 열 수({len(header)})를 벗어난 범위 {spec['range']}")
+        return positions
+    if 'columns' in spec:
+        check_columns(name, header)
+        return [i for i, col in enumerate(header) if col in spec['columns']]
+    if 'exclude' in spec:
+        return [i for i, col in enumerate(header) if col not in spec['exclude']]
+    return None
+
+def check_columns(name, header):
+    missing = [col for col in SHEETS[name].get('columns', []) if col not in header]
+    if missing:
+        raise KeyError(f"{name}: 시트 헤더에 없는 컬럼 {missing}")
+
+def read_usecols(name):
+    """conn.read(read_csv)용 usecols"""
+    spec = SHEETS[name]
+    if 'range' in spec:
+        return range_positions(spec['range'])
+    if 'columns' in spec:
+        return lambda col: col in spec['columns']
+    if 'exclude' in spec:
+        return lambda col: col not in spec['exclude']
+    return None
+
+def fetch_sheet(name):
+    spec = SHEETS[name]
+    # conn.read 자체 캐시는 끄고(ttl=0) 공용 캐시에서만 보관
+    df = conn.read(spreadsheet=sheet_url(spec['key'], spec['gid']), ttl=0, usecols=read_usecols(name))
+    check_columns(name, list(df.columns))
+    return df
+
+def group_by_spreadsheet(names):
+    groups = {}
+    for name in names:
+        groups.setdefault(SHEETS[name]['key'], []).append(name)
+    return groups
+
+@st.cache_resource
+def get_spreadsheet(key):
+    return get_gspread_client().open_by_key(key)
+
+@st.cache_resource
+def worksheet_titles(key):
+    """gid -> 탭 이름 (batchGet 범위는 탭 이름으로 지정해야 함)"""
+    return {ws.id: ws.title for ws in get_spreadsheet(key).worksheets()}
+
+def quote_title(title):
+    return "'{}'".format(title.replace("'", "''"))
+
+@st.cache_resource(ttl=3600)
+def sheet_header(key, gid):
+    """탭의 첫 행(헤더). 투영할 열 번호를 정하는 데 사용"""
+    res = get_spreadsheet(key).values_get(f"{quote_title(worksheet_titles(key)[gid])}!1:1")
+    return res.get('values', [[]])[0]
+
+def position_ranges(title, positions):
+    """열 번호 목록을 연속 구간별 A1 범위로 ('탭'!A:H, '탭'!L:M, ...)"""
+    runs = []
+    for pos in positions:
+        if runs and pos == runs[-1][1] + 1:
+            runs[-1][1] = pos
+        else:
+            runs.append([pos, pos])
+    return [f"{quote_title(title)}!{col_letter(a)}:{col_letter(b)}" for a, b in runs]
+
+def columns_to_frame(columns):
+    """batchGet(열 방향) 결과를 conn.read(CSV 내보내기)와 같은 규칙으로 DataFrame 변환"""
+    if not columns:
+        return pd.DataFrame()
+    height = max(map(len, columns))
+    rows = zip(*[col + [''] * (height - len(col)) for col in columns])
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    return pd.read_csv(buf)
+
+def fetch_batch(key, names):
+    """한 스프레드시트의 여러 탭을 values.batchGet 한 번으로 받아 데이터셋별로 나눈다. (투영한 열 범위만 요청)"""
+    titles = worksheet_titles(key)
+    plan = {}
+    for name in names:
+        spec = SHEETS[name]
+        title = titles[spec['gid']]
+        positions = None
+        if any(k in spec for k in PROJECTION_KEYS):
+            positions = projected_positions(name, sheet_header(key, spec['gid']))
+        plan[name] = [quote_title(title)] if positions is None else position_ranges(title, positions)
+    ranges = list(dict.fromkeys(r for rs in plan.values() for r in rs))  # 겹치는 범위는 한 번만
+    res = get_spreadsheet(key).values_batch_get(ranges, params={'majorDimension': 'COLUMNS'})
+    columns = {r: vr.get('values', []) for r, vr in zip(ranges, res['valueRanges'])}
+    return {name: columns_to_frame([col for r in plan[name] for col in columns[r]]) for name in names}
+
+@st.cache_resource
+def batch_errors():
+    """묶음 조회가 실패해 탭별 조회로 대체 중인 스프레드시트 -> {'names', 'error', 'at'} (성공하면 지움)"""
+    return {}
+
+def fetch_sheets(names):
+    """데이터셋들을 스프레드시트별로 묶어 조회. 묶음 조회가 API/인증/네트워크 오류로 실패하면
+    (서비스계정 키 없음, 쿼터 초과 등) 실패 내용을 batch_errors()에 남기고 개별 conn.read로 대체한다.
+    그 밖의 오류(헤더에 없는 컬럼 등)는 그대로 올려 보낸다."""
+    frames = {}
+    for key, group in group_by_spreadsheet(names).items():
+        if len(group) > 1:
+            try:
+                frames.update(fetch_batch(key, group))
+                batch_errors().pop(key, None)
+                continue
+            except (gspread.exceptions.GSpreadException, rq.RequestException, GoogleAuthError, OSError) as e:
+                batch_errors()[key] = {'names': group, 'error': f'{type(e).__name__}: {e}', 'at': time.time()}
+        for name in group:
+            frames[name] = fetch_sheet(name)
+    return frames
+
+def load_sheet(name):
+    """데이터셋 조회 (캐시 적중 시 네트워크 요청 없음). 메뉴에서 수정해도 캐시는 보존되도록 사본을 반환
+    (compact로 줄인 정수는 int64로 되돌려서)"""
+    df = dataset_frame(name)
+    widened = widen_ints(df)
+    return widened if widened is not df else df.copy()
+
+def dataset_frame(name):
+    """공용 캐시에 보관된 데이터셋 원본 (사본 아님, 수정 금지).
+    DATASET_SHAPES에 있는 데이터셋은 적재 직후 바꾼 모양만 보관한다 (적재한 원래 모양은 버림)"""
+    def load():
+        df = load_from_source(name)
+        return DATASET_SHAPES[name](df) if name in DATASET_SHAPES else df
+    return cached_frame(name, load, SHEETS[name]['ttl'], as_of=lambda: snapshot_time(name))
+
+
+# --- 로컬 스냅샷 (Parquet) ---
+# 시트 원본을 snapshot/ 폴더에 컬럼형 파일로 보관한다.
+# 메모리 캐시 미스 시 스냅샷을 먼저 읽고, 없거나 TTL보다 오래된 경우에만 시트를 조회한다.
+# 시트 조회가 실패(지연/쿼터 초과)하면 오래된 스냅샷이라도 사용한다.
+SNAPSHOT_DIR = os.path.join(current_dir, 'snapshot')
+SNAPSHOT_SYNC_INTERVAL = 60  # 동기화 작업 점검 주기(초)
+
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.parquet")
+
+@st.cache_resource
+def expired_snapshots():
+    """명시적으로 만료 처리된 스냅샷 이름 (다음 조회 시 시트에서 다시 받음)"""
+    return set()
+
+def snapshot_time(name):
+    """스냅샷 생성 시각 = 시트에서 받은 시각"""
+    path = snapshot_path(name)
+    return os.path.getmtime(path) if os.path.exists(path) else time.time()
+
+def snapshot_age(name):
+    """스냅샷 경과 시간(초). 없으면 None"""
+    path = snapshot_path(name)
+    return time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+
+def write_snapshot(name, df):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    # 동기화 스레드와 조회 스레드가 같은 데이터셋을 동시에 쓸 수 있으므로 임시 파일은 쓰기마다 고유 이름
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        try:
+            df.to_parquet(tmp_path, index=False)
+        except (ValueError, TypeError, pa.ArrowException):
+            # 숫자와 문자가 섞인 object 컬럼은 결측을 유지한 채 문자열로 통일 후 저장
+            df = df.copy()
+            for col in df.select_dtypes(include='object').columns:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+            df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)  # 읽는 쪽에서 쓰다 만 파일을 보지 않도록 교체
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    expired_snapshots().discard(name)
+
+def read_snapshot(name, max_age=None):
+    """스냅샷 로드. 없거나 max_age(초)보다 오래되면 None"""
+    age = snapshot_age(name)
+    if age is None or (max_age is not None and (age > max_age or name in expired_snapshots())):
+        return None
+    return pd.read_parquet(snapshot_path(name))
+
+def snapshot_due(name):
+    """스냅샷이 없거나 TTL의 절반이 지나 갱신 대상인지 (메뉴가 항상 신선한 스냅샷을 읽도록 여유를 둠)"""
+    age = snapshot_age(name)
+    return age is None or age >= SHEETS[name]['ttl'] / 2 or name in expired_snapshots()
+
+def load_from_source(name):
+    df = read_snapshot(name, max_age=SHEETS[name]['ttl'])
+    if df is None:
+        # 같은 스프레드시트에서 갱신이 필요한 탭을 함께 받아 스냅샷에 반영
+        key = SHEETS[name]['key']
+        due = [n for n in SHEETS if SHEETS[n]['key'] == key and (n == name or snapshot_due(n))]
+        try:
+            df = refresh_snapshots(due)[name][0]
+        except Exception:
+            df = read_snapshot(name)
+            if df is None:
+                raise
+    record_memory(name, df)  # 스냅샷에서 적재한 경우(재시작 직후 등)도 보고에 반영
+    return df.drop(columns=ROW_HASH, errors='ignore')
+
+def refresh_snapshots(names):
+    """시트에서 내려받아 적재 가공 후 스냅샷을 갱신한다. {이름: (프레임, 변경 통계)}"""
+    results = {}
+    for name, raw in fetch_sheets(names).items():
+        schema = SCHEMAS.get(name, {})
+        if SHEETS[name].get('delta'):
+            df, stats = merge_delta(read_snapshot(name), raw, lambda rows: parse_rows(rows, schema))
+        else:
+            df = parse_rows(raw, schema)
+            stats = {'전체': len(df), '변경': len(df), '삭제': 0}
+        df = compact_frame(df, schema)
+        df.attrs[RAW_BYTES] = frame_bytes(raw)
+        record_memory(name, df)
+        write_snapshot(name, df)
+        results[name] = (df, stats)
+    return results
+
+
+# --- 증분(델타) 동기화 ---
+# 대용량 단위 시트(분양, alv, 동호약정)는 행 내용 해시로 이전 스냅샷과 비교해
+# 추가/변경된 행만 가공(transform)하고, 나머지 행은 이전에 가공된 결과를 재사용한다.
+# (시트 CSV 내보내기는 범위 조건을 받지 않으므로 다운로드 자체는 전체 시트)
+ROW_HASH = '_row_hash'
+
+def row_hashes(df):
+    """행 내용 해시 (같은 내용의 행이 여러 개면 출현 순번을 섞어 구분)"""
+    h = pd.util.hash_pandas_object(df, index=False)
+    occurrence = h.groupby(h).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({'h': h.to_numpy(), 'n': occurrence.to_numpy()}),
+                                      index=False).to_numpy()
+
+def merge_delta(base, raw, transform=None):
+    """base(이전 스냅샷, ROW_HASH 포함)에 raw(새 원본)의 변경분만 병합. 행 순서는 raw 기준.
+    transform은 행 수를 늘려도 되지만 ROW_HASH 컬럼은 유지해야 한다."""
+    new_hash = row_hashes(raw)
+    if base is not None and ROW_HASH in base.columns:
+        kept = base[ROW_HASH].isin(new_hash).to_numpy()
+        changed = ~pd.Index(new_hash).isin(base[ROW_HASH])
+    else:
+        kept = np.zeros(0 if base is None else len(base), dtype=bool)
+        changed = np.ones(len(raw), dtype=bool)
+    fresh = raw[changed].assign(**{ROW_HASH: new_hash[changed]})
+    if transform:
+        fresh = transform(fresh)
+    parts = [fresh] if base is None or not kept.any() else [base[kept], fresh]
+    df = pd.concat(parts, ignore_index=True)
+    # 원본 시트의 행 순서로 복원
+    order = pd.Index(new_hash).get_indexer(df[ROW_HASH])
+    df = df.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+    stats = {'전체': len(raw), '변경': int(changed.sum()),
+             '삭제': 0 if base is None else int(len(base) - kept.sum())}
+    return df, stats
+
+def invalidate_dataset(name=None):
+    """메모리 캐시를 비우고 스냅샷도 만료 처리(파일은 장애 대비용으로 유지)하여 다음 조회 시 시트에서 다시 받게 한다."""
+    get_sheet_cache().invalidate(name)
+    expired_snapshots().update([name] if name else SHEETS)
+
+def sync_snapshots(names=None, force=False):
+    """카탈로그의 데이터셋을 시트에서 내려받아 스냅샷을 갱신한다. (스프레드시트 단위 묶음 조회)
+    force=False면 갱신 대상(snapshot_due)만 받는다."""
+    due = [name for name in (names or SHEETS) if force or snapshot_due(name)]
+    results = {}
+    for group in group_by_spreadsheet(due).values():
+        try:
+            for name, (_, stats) in refresh_snapshots(group).items():
+                results[name] = f"{stats['전체']:,}행 (변경 {stats['변경']:,} / 삭제 {stats['삭제']:,})"
+        except Exception as e:
+            results.update({name: f"오류: {e}" for name in group})
+    return results
+
+@st.cache_resource
+def start_snapshot_sync():
+    """서버 프로세스당 한 번, 스냅샷 동기화 스레드를 띄운다."""
+    def run():
+        while True:
+            sync_snapshots()
+            time.sleep(SNAPSHOT_SYNC_INTERVAL)
+    worker = threading.Thread(target=run, name='snapshot-sync', daemon=True)
+    worker.start()
+    return worker
+
+# --- 표 스타일 ---
+# 셀마다 파이썬 함수를 부르는 Styler.apply/format 대신, 규칙으로 CSS 행렬과 표시 문자열 행렬을
+# NumPy 연산으로 한 번에 만들고 Styler.apply(axis=None) 한 번으로 입힌다.
+# 규칙 (dict, 목록 순서대로 CSS가 이어 붙으므로 같은 속성은 뒤 규칙이 우선)
+#   {'rows': [행 이름], 'css': ...}               행 이름(멀티인덱스면 마지막 레벨)
+#   {'cols': [컬럼 이름], 'css': ...}             컬럼
+#   {'where': (컬럼, [값]), 'css': ...}           해당 컬럼 값이 목록에 있는 행
+#   {'months_until': 기준일, 'css': ..., 'else': ...}  'YYYY-MM' 컬럼 중 기준일 이전 / 이후
+HIGHLIGHT_ROWS = ['영업이익', '원가율', '경상이익', '소계', '과부족']
+ROW_HIGHLIGHT = {'rows': HIGHLIGHT_ROWS, 'css': 'background-color: black;'}
+RATE_COLS = {'cols': ['계약(%)', '완납(%)', '소송(%)'], 'css': 'color: yellow;'}
+CASH_ROWS = {'rows': ['수입', '지출', '과부족'], 'css': 'background-color: lightyellow; color: black; font-weight: bold;'}
+
+def last_month_end():
+    """오늘 기준 전월 말일 (월별 컬럼 음영 기준)"""
+    return pd.Timestamp.today().normalize().replace(day=1) - pd.Timedelta(days=1)
+
+def row_labels(df):
+    idx = df.index
+    return np.asarray(idx.get_level_values(-1) if isinstance(idx, pd.MultiIndex) else idx, dtype=object)
+
+def style_matrix(df, rules=()):
+    """규칙 -> 셀별 CSS 문자열 (df와 같은 모양의 DataFrame)"""
+    css = np.full(df.shape, '', dtype=object)
+    for rule in rules:
+        if 'rows' in rule:
+            mask = np.isin(row_labels(df), rule['rows'])[:, None]
+        elif 'cols' in rule:
+            mask = np.isin(np.asarray(df.columns, dtype=object), rule['cols'])[None, :]
+        elif 'where' in rule:
+            col, values = rule['where']
+            mask = df[col].isin(values).to_numpy()[:, None]
+        else:
+            months = pd.to_datetime(pd.Index(df.columns.astype(str)), format='%Y-%m', errors='coerce')
+            valid = ~months.isna()
+            past = valid & (months <= rule['months_until'])
+            css[:, past] += rule['css']
+            css[:, valid & ~past] += rule.get('else', '')
+            continue
+        css = np.where(np.broadcast_to(mask, css.shape), css + rule['css'], css)
+    return pd.DataFrame(css, index=df.index, columns=df.columns)
+
+def thousands(values):
+    """정수로 반올림한 값 -> 천단위 콤마 문자열 (배열 연산, 세 자리 그룹 수만큼만 반복)"""
+    num = np.rint(values).astype('int64')
+    neg, rest = num < 0, np.abs(num)
+    group = lambda r: np.where(r >= 1000, np.char.mod('%03d', r % 1000), np.char.mod('%d', r % 1000))
+    out = group(rest)
+    rest = rest // 1000
+    while (rest > 0).any():
+        out = np.where(rest > 0, np.char.add(np.char.add(group(rest), ','), out), out)
+        rest = rest // 1000
+    return np.where(neg, np.char.add('-', out), out)
+
+def number_strings(values, spec=',.0f', blank_zero=False):
+    """숫자 배열 -> 표시 문자열. spec은 ',.0f'(천단위) 또는 '.1f' 등 printf 형식, 결측은 빈칸"""
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    safe = np.where(missing, 0, values)
+    out = (thousands(safe) if spec == ',.0f' else np.char.mod('%' + spec, safe)).astype(object)
+    out[missing | (blank_zero & (values == 0))] = ''
+    return out
+
+def format_matrix(df, spec=',.0f', formats=None, blank_zero=False):
+    """표시 문자열 DataFrame. 숫자 컬럼은 formats[컬럼] 또는 spec으로, 나머지는 문자열 그대로"""
+    formats = formats or {}
+    out = df.astype(object).where(df.notna(), '')
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    plain = [c for c in numeric if c not in formats]
+    if plain:
+        out[plain] = number_strings(df[plain].to_numpy(dtype='float64'), spec, blank_zero)
+    for col in numeric:
+        if col in formats:
+            out[col] = number_strings(df[col].to_numpy(dtype='float64'), formats[col], blank_zero)
+    return out
+
+def render_table(display, css):
+    """표시 문자열에 CSS 행렬을 한 번에 적용한 Styler"""
+    css = css.to_numpy()
+    return display.style.apply(lambda _: css, axis=None)
+
+def style_table(df, rules=(), **fmt):
+    return render_table(format_matrix(df, **fmt), style_matrix(df, rules))
+
+def cached_table(key, build, ttl, source=None, rules=(), **fmt):
+    """build()의 표를 표시 문자열과 CSS로 바꿔 한 항목으로 캐시 (key에 규칙 기준값 포함)"""
+    def styled():
+        df = build()
+        return pd.concat({'표시': format_matrix(df, **fmt), '스타일': style_matrix(df, rules)}, axis=1)
+    both = cached_frame(key, styled, ttl, source=source)
+    return render_table(both['표시'], both['스타일'])
 
 
 @st.cache_data
@@ -308,61 +1049,741 @@ def get_applyhome_detail(manage_no):
             
     return pd.DataFrame()
 
-@st.cache_data
-def alv_data():
-    url = "https://docs.google.com/spreadsheets/d/1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM/edit?gid=0#gid=0"   
-    #url = "https://docs.google.com/spreadsheets/d/1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM/edit?gid=1989275734#gid=1989275734"
-    #str_txt = '프로젝트,프로젝트 내역,당월매출,금년매출,누계매출,당월매원,금년매원,누계매원,당사업경비,금사업경비,누사업경비,당용지비,금누계비,누용지비,당월판관비(수주후),금년판관비(수주후),누계판관비(수주후),당월판관비(수주전),금년판관비(수주전),누계판관비(수주전),당월금융비,금년금융비,누계금융비,당현장원가,금현장원가,누현장원가,당공손충,연공손충,누공손충,당월(실)하자보수비,금년(실)하자보수비,누계(실)하자보수비,당기타영업수익,금기타영업수익,누기타영업수익,당기타영업비용,금기타영업비용,누기타영업비용,당이자수익,금이자수익,누이자수익,당이자비용,금이자비용,누이자비용,기준월'
-    #col_list = list(str_txt.split(","))
-    
-    ddf = conn.read(spreadsheet=url)      
-    df = pd.DataFrame(ddf)       
-    #df = df[col_list]
-    # 문자열 컬럼 제외하고 모두 숫자형으로 변환
-    base_cols = ['프로젝트', '프로젝트 내역', '기준월']
-    for col in df.columns:
-        if col not in base_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-    
-    dff = df.melt(id_vars=base_cols, var_name='항목', value_name='값')
-    # '기간기준' 조건 열 추가 (Power Query의 '조건 열이 추가됨' 단계) : np.select로 효율적으로 구현
-    p_conds = [
-        dff['항목'].str.contains('누계금'),
-        dff['항목'].str.contains('당'),
-        dff['항목'].str.contains('금'),
-        dff['항목'].str.contains('누'),
-        dff['항목'].str.contains('연')]
-    p_choices = ['누계', '당월', '금년', '누계', '금년']
-    dff['기간기준'] = np.select(p_conds, p_choices, default=None)
-
-    # '항목기준' 조건 열 추가 (Power Query의 '조건 열이 추가됨1' 단계)
-    i_conds = [
-        dff['항목'].str.contains('매출'),
-        dff['항목'].str.contains('매원'),
-        dff['항목'].str.contains('경비'),
-        dff['항목'].str.contains('판관비'),
-        dff['항목'].str.contains('금융비'),
-        dff['항목'].str.contains('현장원가'),
-        dff['항목'].str.contains('하자보수비'),
-        dff['항목'].str.contains('공손충'),
-        dff['항목'].str.contains('영업수익'),
-        dff['항목'].str.contains('영업비용'),
-        dff['항목'].str.contains('이자수익'),
-        dff['항목'].str.contains('이자비용'),
-        dff['항목'].str.contains('용지비|금누계비') # '용지비' 또는 '금누계비'
-    ]
-    i_choices = [
-        '매출', '매원', '경비', '판관비', '금융비', '공사비', 
-        '하자보수비', '공손충', '기타영업수익', '기타영업비용', 
-        '이자수익', '이자비용', '토지비']
-    dff['항목기준'] = np.select(i_conds, i_choices, default=None)
-
-    # 6. 열 재정렬 (Power Query의 '다시 정렬한 열 수' 단계)
-    final_cols = ["프로젝트", "프로젝트 내역", "기준월", "기간기준", "항목기준", "항목", "값"]
-    dff = dff[final_cols]
-    return dff
+# alv는 적재 시 가로형 정수 행렬(alv_wide)로 바꿔 그것 하나만 공용 캐시('alv')에 두고, 항목 분류표(alv_items)를 곁에 둔다.
+# 세로형은 조회에 필요한 행만 그때그때 펼친다. (행 수가 항목 수만큼 늘어나므로 캐시하지 않음)
+def alv_wide():
+    """(프로젝트, 프로젝트 내역, 기준월) x 항목 행렬. 값은 적재 시 줄인 정수형 그대로 (소수가 있으면 float64)"""
+    return dataset_frame('alv')
+
+def alv_items():
+    """항목(컬럼명)별 기간기준/항목기준 분류표 (컬럼명마다 한 번만 분류)"""
+    return cached_frame('alv_items', lambda: classify_alv_items(alv_wide().columns), SHEETS['alv']['ttl'], source='alv')
+
+def alv_projects():
+    """alv의 프로젝트 내역 목록 (pjcode 화면용, alv_wide에서 파생)"""
+    return cached_frame('alv_projects', lambda: pd.DataFrame({'프로젝트 내역': alv_wide().index.unique('프로젝트 내역')}),
+                        SHEETS['alv']['ttl'], source='alv')
+
+def build_alv_wide(ddf):
+    """적재한 alv(숫자 변환은 SCHEMAS['alv']에서 완료) -> 가로형. 메모리 보고에 'alv_wide'로 남김 (원본 = 적재 직후 크기)"""
+    items = [c for c in ddf.columns if c not in ALV_BASE_COLS]
+    # 값 컬럼은 compact로 줄인 형을 유지 (합산하는 쪽에서 widen_ints로 int64로 올림)
+    index = pd.MultiIndex.from_arrays([ddf[col] for col in ALV_BASE_COLS])  # 레벨별 고유값 + 코드
+    wide = ddf[items].set_axis(index, axis=0).set_axis(pd.Index(items, dtype=object), axis=1)
+    wide.attrs[RAW_BYTES] = frame_bytes(ddf)
+    record_memory('alv_wide', wide)
+    return wide
+
+def alv_long(month=None, projects=None):
+    """기준월, 프로젝트 내역(목록, project_keys로 비교)에 해당하는 행만 세로형으로. 검색은 행이 아닌 고유 이름 단위"""
+    wide = alv_wide()
+    index = wide.index
+    mask = np.ones(len(wide), dtype=bool)
+    if month is not None:
+        i = index.names.index('기준월')
+        mask &= np.asarray(index.levels[i] == month)[index.codes[i]]
+    if projects is not None:
+        i = index.names.index('프로젝트 내역')
+        mask &= project_keys(index.levels[i]).isin(project_keys(projects))[index.codes[i]]
+    return unpivot_alv(wide[mask])
+
+def project_keys(names):
+    """프로젝트 내역 비교 키: 대소문자와 앞뒤 공백만 무시 (부분 일치 아님)"""
+    return pd.Index(names, dtype=object).str.strip().str.upper()
+
+DATASET_SHAPES = {'alv': build_alv_wide}
+
+# 항목(컬럼명) 분류 규칙: 위에서부터 먼저 맞는 규칙 적용 (Power Query '조건 열이 추가됨' 단계)
+ALV_PERIOD_RULES = [('누계금', '누계'), ('당', '당월'), ('금', '금년'), ('누', '누계'), ('연', '금년')]
+ALV_ITEM_RULES = [('매출', '매출'), ('매원', '매원'), ('경비', '경비'), ('판관비', '판관비'), ('금융비', '금융비'),
+                  ('현장원가', '공사비'), ('하자보수비', '하자보수비'), ('공손충', '공손충'),
+                  ('영업수익', '기타영업수익'), ('영업비용', '기타영업비용'), ('이자수익', '이자수익'),
+                  ('이자비용', '이자비용'), ('용지비|금누계비', '토지비')]  # '용지비' 또는 '금누계비'
+ALV_PERIODS = ['당월', '금년', '누계']
+ALV_ITEMS = list(dict.fromkeys(c for _, c in ALV_ITEM_RULES))
+
+def classify_alv_items(items):
+    """항목(컬럼명)별 기간기준/항목기준 표. 셀이 아닌 컬럼 수만큼만 검사 (해당 없음은 결측)"""
+    items = pd.Index(items, dtype=object)
+    def pick(rules, categories):
+        values = np.select([items.str.contains(p) for p, _ in rules], [c for _, c in rules], default=None)
+        return pd.Categorical(values, categories=categories)
+    return pd.DataFrame({'기간기준': pick(ALV_PERIOD_RULES, ALV_PERIODS),
+                         '항목기준': pick(ALV_ITEM_RULES, ALV_ITEMS)}, index=items)
+
+def alv_item_labels(items):
+    """items의 분류. 캐시된 분류표에서 찾고, 표에 없는 컬럼만 새로 분류"""
+    labels = alv_items()
+    missing = pd.Index(items, dtype=object).difference(labels.index)
+    if len(missing):
+        labels = pd.concat([labels, classify_alv_items(missing)])
+    return labels.loc[items]
+
+def unpivot_alv(wide):
+    """가로형 -> 세로형 (프로젝트, 프로젝트 내역, 기준월, 기간기준, 항목기준, 항목, 값)
+    melt와 같은 순서(항목별로 전체 행)로 배열을 직접 만들고, 분류는 항목 코드로 옮겨 담는다. 값 외에는 모두 category"""
+    items = wide.columns
+    labels = alv_item_labels(items)
+    codes = np.repeat(np.arange(len(items)), len(wide))
+
+    def tiled(level):
+        return pd.Categorical.from_codes(np.tile(wide.index.codes[level], len(items)), wide.index.levels[level])
+
+    def by_item(col):
+        cat = labels[col].array
+        return pd.Categorical.from_codes(cat.codes[codes], cat.categories)
+
+    # 값 컬럼은 작은 정수형이므로 합산해도 넘치지 않도록 공통형(int64/float64)으로
+    value_dtype = np.result_type(np.int64, *wide.dtypes)
+    return pd.DataFrame({
+        **{col: tiled(i) for i, col in enumerate(ALV_BASE_COLS)},
+        '기간기준': by_item('기간기준'),
+        '항목기준': by_item('항목기준'),
+        '항목': pd.Categorical.from_codes(codes, items),
+        '값': wide.to_numpy(dtype=value_dtype).ravel(order='F'),
+    })
+
+# --- 손익 (실적조회) ---
+# 전 사업/기준월의 항목기준 합계를 한 번의 groupby로 (기준월, 프로젝트, 프로젝트 내역, 기간기준) x 항목기준
+# cube로 만들고, 파생 항목은 열 연산으로 계산한다. 사업별 화면과 전체 순위표는 이 cube를 잘라서 쓴다.
+PNL_ORDER = ['매출', '토지비', '공사비', '경비', '공손충', '하자보수비', '매원', '원가율', '매출이익',
+             '판관비', '영업이익', '기타영업수익', '기타영업비용', '금융비', '이자수익', '이자비용', '경상이익']
+PNL_KEYS = ['기준월', '프로젝트', '프로젝트 내역']
+PNL_INDEX = ['프로젝트', '기간기준']
+PNL_RANK_COLS = ['매출', '매원', '원가율', '매출이익', '영업이익', '경상이익']
+
+def pnl_base(wide, by):
+    """가로형 행 -> by별 기간기준 x 항목기준 합계 (없는 항목은 0), 인덱스는 by + 기간기준"""
+    labels = alv_item_labels(wide.columns)
+    keep = (labels['기간기준'].notna() & labels['항목기준'].notna()).to_numpy()
+    sums = widen_ints(wide.loc[:, keep].groupby(level=by).sum())
+    sums.columns = pd.MultiIndex.from_arrays([labels['기간기준'].astype(object)[keep], labels['항목기준'].astype(object)[keep]])
+    grid = pd.MultiIndex.from_product([ALV_PERIODS, ALV_ITEMS])
+    summed = sums.T.groupby(level=[0, 1]).sum().reindex(grid, fill_value=0)
+    # (기간, 항목, 그룹) -> (그룹, 기간, 항목)
+    values = summed.to_numpy().reshape(len(ALV_PERIODS), len(ALV_ITEMS), len(sums)).transpose(2, 0, 1)
+    keys = [sums.index.get_level_values(k).repeat(len(ALV_PERIODS)) for k in by]
+    index = pd.MultiIndex.from_arrays(keys + [np.tile(ALV_PERIODS, len(sums))], names=by + ['기간기준'])
+    return pd.DataFrame(values.reshape(-1, len(ALV_ITEMS)), columns=ALV_ITEMS, index=index)
+
+def derive_pnl(base):
+    """매출이익/영업이익/경상이익/원가율 열 추가 (원가율은 매출 0이면 0)"""
+    gross = base['매출'] - base['매원']
+    operating = gross - base['판관비']
+    ordinary = (operating + base['기타영업수익'] - base['기타영업비용']
+                + base['이자수익'] - base['이자비용'] - base['금융비'])
+    ratio = (base['매원'] / base['매출'].replace(0, np.nan)).fillna(0) * 100
+    return base.assign(원가율=ratio, 매출이익=gross, 영업이익=operating, 경상이익=ordinary)[PNL_ORDER]
+
+def pnl_cube():
+    """전 사업 손익 cube. alv가 다시 적재되면 함께 만료"""
+    return cached_frame('손익_cube', lambda: derive_pnl(pnl_base(alv_wide(), PNL_KEYS)), SHEETS['alv']['ttl'], source='alv')
+
+def pnl_matrix(month, pj):
+    """기준월, 프로젝트 내역(project_keys로 비교: 대소문자·앞뒤 공백 무시, 부분 일치 아님)의 (프로젝트, 기간기준) 손익 행렬.
+    cube의 기본 항목을 프로젝트별로 더해 다시 파생. 일치하는 내역이 없으면 빈 표"""
+    key = project_keys([pj])[0] if pj else None
+    def build():
+        cube = pnl_cube()
+        rows = cube[cube.index.get_level_values('기준월') == month]
+        if key:
+            codes, names = pd.factorize(rows.index.get_level_values('프로젝트 내역'))
+            rows = rows[(project_keys(names) == key)[codes]]
+        base = rows[ALV_ITEMS].groupby(level=PNL_INDEX).sum()
+        grid = pd.MultiIndex.from_product([base.index.unique('프로젝트'), ALV_PERIODS], names=PNL_INDEX)
+        return derive_pnl(base.reindex(grid, fill_value=0))
+    return cached_frame(f'손익|{month}|{key}', build, SHEETS['alv']['ttl'], source='손익_cube')
+
+def pnl_ranking(month, period='누계'):
+    """기준월 전 사업(프로젝트 내역별) 손익, 원가율 높은 순"""
+    cube = pnl_cube()
+    rows = cube.xs((month, period), level=['기준월', '기간기준'])[PNL_RANK_COLS]
+    return rows.sort_values('원가율', ascending=False, kind='stable').reset_index()
+
+def pnl_total(matrices, label='합계'):
+    """여러 손익 행렬의 기본 항목을 더해 다시 파생 (원가율도 합계 기준)"""
+    matrices = [m for m in matrices if not m.empty]
+    if not matrices:
+        return pd.DataFrame()
+    base = pd.concat([m[ALV_ITEMS] for m in matrices]).groupby(level='기간기준').sum().reindex(ALV_PERIODS)
+    base.index = pd.MultiIndex.from_product([[label], ALV_PERIODS], names=PNL_INDEX)
+    return derive_pnl(base)
+
+def pnl_table(matrix):
+    """손익 행렬 -> (프로젝트, 항목기준) x 기간기준 표"""
+    projects = matrix.index.unique('프로젝트')
+    values = matrix.to_numpy(dtype='float64').reshape(len(projects), len(ALV_PERIODS), len(PNL_ORDER)).transpose(0, 2, 1)
+    return pd.DataFrame(values.reshape(-1, len(ALV_PERIODS)), columns=pd.Index(ALV_PERIODS, name='기간기준'),
+                        index=pd.MultiIndex.from_product([projects, PNL_ORDER], names=['프로젝트', '항목기준']))
+
+
+# --- 추진일정 (세로형) ---
+SCHEDULE_SENTINEL = pd.Timestamp('1900-02-01')  # 시트의 빈 날짜(1900-01-xx)는 일정 없음으로 간주
+
+def schedule_long():
+    """전체 사업 추진일정 (사업명 인덱스, 순번/날짜/일정명). 추진일정 갱신 시 함께 제거"""
+    return cached_frame('추진일정_long', build_schedule_long, SHEETS['추진일정']['ttl'], source='추진일정')
+
+def build_schedule_long():
+    # 일정1..12 / 일정명1..12 가로형을 한 번에 세로로 펼친다.
+    wide = dataset_frame('추진일정')
+    n = len(SCHEDULE_DATES)
+    long = pd.DataFrame({
+        '사업명': np.repeat(wide['사업명'].to_numpy(), n),
+        '순번': np.tile(np.arange(1, n + 1, dtype='int8'), len(wide)),
+        '날짜': pd.to_datetime(pd.Series(wide[SCHEDULE_DATES].to_numpy().ravel()), errors='coerce'),
+        '일정명': wide[SCHEDULE_NAMES].to_numpy().ravel()})
+    valid = (long['날짜'] >= SCHEDULE_SENTINEL) & long['일정명'].notna() & (long['일정명'] != '')
+    return long[valid].sort_values(['사업명', '순번']).set_index('사업명')
+
+def project_schedule(pj):
+    sched = schedule_long()
+    return sched.loc[[pj]] if pj in sched.index else sched.iloc[0:0]
+
+
+# --- 조감도 이미지 ---
+# 원본(최대 1MB 이상)을 그대로 보내지 않고, 긴 변 기준으로 줄인 WebP(미지원 시 JPEG)를 만들어
+# 메모리(st.cache_data)와 디스크(snapshot/thumb)에 보관한다. 원본이 바뀌면(mtime) 다시 만든다.
+IMAGE_DIR = os.path.join(current_dir, 'image')
+THUMB_DIR = os.path.join(SNAPSHOT_DIR, 'thumb')
+THUMB_MAX_PX = 960
+THUMB_QUALITY = 80
+
+def image_key(name):
+    """파일명/사업명 -> 비교용 키 ('관저 _thumb' -> '관저')"""
+    return re.sub(r'[\s_]*thumb$', '', name, flags=re.I).replace(' ', '')
+
+@st.cache_resource
+def image_index():
+    """image/ 폴더의 키 -> 파일 경로 (프로세스당 한 번)"""
+    index = {}
+    if os.path.isdir(IMAGE_DIR):
+        for fname in sorted(os.listdir(IMAGE_DIR)):
+            stem, ext = os.path.splitext(fname)
+            if ext.lower() in ('.jpg', '.jpeg', '.png', '.webp'):
+                index.setdefault(image_key(stem), os.path.join(IMAGE_DIR, fname))
+    return index
+
+def find_image(pj):
+    """사업명에 해당하는 조감도 파일 (같은 이름 우선, 없으면 사업명에 포함된 가장 긴 이름)"""
+    index = image_index()
+    key = image_key(pj)
+    if key in index:
+        return index[key]
+    matches = [k for k in index if k and k in key]
+    return index[max(matches, key=len)] if matches else None
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def thumbnail_bytes(path, mtime, max_px=THUMB_MAX_PX):
+    """축소 이미지 바이트. 디스크에 만들어 둔 것이 있으면 그대로 읽는다."""
+    digest = hashlib.md5(f"{path}|{mtime}|{max_px}".encode()).hexdigest()
+    for ext in ('webp', 'jpg'):
+        cached = os.path.join(THUMB_DIR, f"{digest}.{ext}")
+        if os.path.exists(cached):
+            with open(cached, 'rb') as f:
+                return f.read()
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_px, max_px))
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        buf, ext = io.BytesIO(), 'webp'
+        try:
+            img.save(buf, 'WEBP', quality=THUMB_QUALITY, method=4)
+        except (KeyError, OSError):
+            buf, ext = io.BytesIO(), 'jpg'
+            img.save(buf, 'JPEG', quality=THUMB_QUALITY, optimize=True, progressive=True)
+    data = buf.getvalue()
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    # 여러 세션이 같은 이미지를 동시에 만들 수 있으므로 임시 파일은 쓰기마다 고유 이름 (write_snapshot과 같은 방식)
+    fd, tmp_path = tempfile.mkstemp(dir=THUMB_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(THUMB_DIR, f"{digest}.{ext}"))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return data
+
+def project_image(pj, max_px=THUMB_MAX_PX):
+    """사업명의 조감도 (축소본 바이트, 없으면 None)"""
+    path = find_image(pj)
+    if path is None:
+        return None
+    return thumbnail_bytes(path, os.path.getmtime(path), max_px)
   
 
+# --- 분양 집계 ---
+# 분양 메뉴의 표들은 모두 cube(키별 세대수/총분양금)에서 파생한다.
+# 사업명별 cube는 분양 갱신 시 한 번 만들어 두고, 사업 전환은 인덱스 조회로 처리한다.
+SALES_KEYS = ['상품', '계약여부', '완납여부', '소송', '계약여부2']
+PRODUCT_ORDER = ['아파트', '오피스텔', '생활숙박시설', '지식산업센터', '판매시설', '상가']
+ALL_PROJECTS = '전체 사업'
+
+def sales_cube(df, by=()):
+    """(by, 상품, 계약여부, 완납여부, 소송, 계약여부2)별 세대수/총분양금/입주증 합계. 키는 object로 반환"""
+    keys = list(by) + SALES_KEYS
+    cube = df.groupby(keys, observed=True, dropna=False).agg(
+        세대=('동호수', 'count'), 총분양금=('총분양금', 'sum'), 입주증=('입주증번호', 'sum')).reset_index()
+    # 측정값은 int64로 고정 (스키마에서 compact로 축소하더라도 재집계 시 넘치지 않도록)
+    return cube.astype({**{c: object for c in keys}, '세대': 'int64', '총분양금': 'int64', '입주증': 'int64'})
+
+def sales_cubes():
+    """사업명 인덱스의 분양 cube. 분양 갱신 시 함께 제거"""
+    return cached_frame('분양_cube', lambda: sales_cube(dataset_frame('분양'), by=['사업명']).set_index('사업명').sort_index(),
+                        SHEETS['분양']['ttl'], source='분양')
+
+def matching_projects(names, pj):
+    """사업명 중 pj가 들어간 것 (대소문자 무시, 문자 그대로 비교). 기존 화면처럼 'X'를 고르면
+    하위 단지('X 2단지')도 함께 묶인다. ALL_PROJECTS면 전부"""
+    names = pd.Index(names.unique(), dtype=object)
+    if pj == ALL_PROJECTS:
+        return names
+    return names[names.str.contains(pj, case=False, regex=False)]
+
+def project_sales(pj):
+    """선택 사업의 cube. pj가 들어간 사업이 여럿이면(ALL_PROJECTS 포함) 합산 (원본 재집계 없음)"""
+    cubes = sales_cubes()
+    names = matching_projects(cubes.index, pj)
+    cube = cubes[cubes.index.isin(names)].reset_index(drop=True)
+    if len(names) <= 1:
+        return cube
+    return cube.groupby(SALES_KEYS, dropna=False).sum().reset_index()
+
+def sales_trend():
+    """사업명 x 상품 x 월 누적 계약/완납 세대와 비율 (사업명 인덱스). 분양 갱신 시 함께 제거"""
+    return cached_frame('분양_추이', build_sales_trend, SHEETS['분양']['ttl'], source='분양')
+
+def build_sales_trend():
+    # 전 사업 x 상품에 같은 월 격자(첫 계약/완납월 ~ 마지막 월)를 깔고 월별 건수를 누적한다.
+    data = dataset_frame('분양')
+    keys = [data['사업명'].astype(object), data['상품'].astype(object)]
+    supply = data.groupby(keys)['동호수'].count()
+    contract = data['계약월'].dt.to_period('M')
+    paid = data['완납월'].dt.to_period('M').where(data['완납여부'] == '완납')
+    events = pd.concat([contract, paid]).dropna()
+    columns = ['사업명', '상품', '월', '누적계약', '누적완납', '총공급', '계약률', '완납률']
+    if supply.empty or events.empty:
+        return pd.DataFrame(columns=columns).set_index('사업명')
+    months = pd.period_range(events.min(), events.max(), freq='M')
+    grid = pd.MultiIndex.from_arrays([
+        np.repeat(supply.index.get_level_values(0), len(months)),
+        np.repeat(supply.index.get_level_values(1), len(months)),
+        np.tile(months, len(supply))], names=['사업명', '상품', '월'])
+
+    def cumulative(month):
+        counts = data.groupby(keys + [month.rename('월')])['동호수'].count()
+        return counts.reindex(grid, fill_value=0).to_numpy().reshape(len(supply), len(months)).cumsum(axis=1).ravel()
+
+    trend = grid.to_frame(index=False)
+    trend['월'] = trend['월'].dt.to_timestamp()
+    trend['누적계약'] = cumulative(contract)
+    trend['누적완납'] = cumulative(paid)
+    trend['총공급'] = np.repeat(supply.to_numpy(), len(months))
+    return with_rates(trend)[columns].set_index('사업명')
+
+def with_rates(trend):
+    trend['계약률'] = trend['누적계약'] / trend['총공급']
+    trend['완납률'] = trend['누적완납'] / trend['총공급']
+    return trend
+
+def project_trend(pj):
+    """선택 사업의 상품별 월 추이 (pj가 들어간 사업이 여럿이면 합산, project_sales와 같은 묶음). 첫 계약/완납월 이전은 제외"""
+    trend = sales_trend()
+    names = matching_projects(trend.index, pj)
+    trend = trend[trend.index.isin(names)].reset_index(drop=True)
+    if len(names) > 1:
+        trend = with_rates(trend.groupby(['상품', '월'], as_index=False)[['누적계약', '누적완납', '총공급']].sum())
+    active = trend['누적계약'] + trend['누적완납'] > 0
+    return trend[trend['월'] >= trend.loc[active, '월'].min()] if active.any() else trend.iloc[0:0]
+
+def portfolio_trend():
+    """사업별 월 누적 계약/완납률 (상품 합산, 사업 간 비교용)"""
+    trend = sales_trend().reset_index()
+    trend = with_rates(trend.groupby(['사업명', '월'], as_index=False)[['누적계약', '누적완납', '총공급']].sum())
+    return trend[trend['누적계약'] + trend['누적완납'] > 0]
+
+def share_table(cube, by, measure, total, labels, by_product=False):
+    """상품 x by 구성비 표. total은 행 합계 컬럼명, labels는 표시할 by 값 (금액은 백만원 단위)
+    by_product=True면 상품 지정 순서로, 아니면 합계 내림차순으로 정렬"""
+    dfp = cube.pivot_table(index='상품', columns=by, values=measure, aggfunc='sum', fill_value=0)
+    dfp[total] = dfp.sum(axis=1)
+    if measure == '총분양금':
+        dfp = (dfp / 1_000_000).round(0)
+    dfp = dfp.sort_values(by=total, ascending=False)
+    for col in labels:
+        if col not in dfp.columns:
+            dfp[col] = 0
+        dfp[f'{col}(%)'] = (dfp[col] / dfp[total] * 100).round(0).fillna(0)
+    dfp = dfp[[total] + labels + [f'{col}(%)' for col in labels]].reset_index()
+    if by_product:
+        dfp['상품'] = pd.Categorical(dfp['상품'], categories=PRODUCT_ORDER, ordered=True)
+        dfp = dfp.sort_values(by='상품')
+    return dfp
+
+
+# --- 동호약정 집계 ---
+# 현장 시트 -> (상품, 약정월, 차수, 동호수) 합계(base) -> 화면별 표.
+# 모두 해당 시트의 파생 항목이라 시트가 갱신될 때만 다시 만든다.
+# 현장은 SHEETS의 '동호약정_<현장>' 항목으로 정해진다. (현장 추가 = 카탈로그 항목 추가)
+DONGHO_SITES = {name.split('_', 1)[1]: name for name in SHEETS if name.startswith('동호약정_')}
+ALL_SITES = '전체 현장'
+DONGHO_TYPES = ['약정원금', '납부원금']
+
+def map_distinct(s, func):
+    """반복 값이 많은 문자열 컬럼에 func를 고유값에만 적용"""
+    codes, uniques = pd.factorize(s)
+    mapped = np.append(func(pd.Series(uniques, dtype=object)).to_numpy(dtype=object), None)  # 결측(-1)은 마지막 None
+    return pd.Series(mapped[codes], index=s.index)
+
+def unit_label(units):
+    """정수 동호수 키(동*10000+호) -> '101-0203'"""
+    units = pd.Series(units)
+    return (units // 10000).astype(str) + '-' + (units % 10000).astype(str).str.zfill(4)
+
+def dongho_base(name):
+    return cached_frame(f'{name}_base', lambda: build_dongho_base(name), SHEETS[name]['ttl'], source=name)
+
+def build_dongho_base(name):
+    raw = dataset_frame(name)
+    raw = raw[(raw['동'] != '합계') & (raw['주택형'] != '소계') & raw['약정일자'].notna()]
+    rows = pd.DataFrame({
+        '상품': map_distinct(raw['세대속성'], lambda u: u.str.split('/').str[0]).astype('category'),
+        '약정월': raw['약정일자'].dt.to_period('M'),
+        '차수': raw['차수'].astype('category'),
+        '동호수': pd.to_numeric(raw['동'], errors='coerce').fillna(0).astype('int64') * 10000
+                  + pd.to_numeric(raw['호수'], errors='coerce').fillna(0).astype('int64'),
+        '약정금액': raw['약정금액'],
+        '납부원금': raw['납부원금']})
+    # 금액은 원본 형 그대로 합산 (소수가 남은 float은 자르지 않고, 합계가 모두 정수일 때만 int64로)
+    base = widen_ints(rows.groupby(['상품', '약정월', '차수', '동호수'], observed=True)[['약정금액', '납부원금']].sum()).reset_index()
+    for col in ['약정금액', '납부원금']:
+        if base[col].dtype.kind == 'f' and (base[col] % 1 == 0).all():
+            base[col] = base[col].astype('int64')
+    base['차수구분'] = base['차수'].cat.rename_categories(lambda c: c[:2]) if base['차수'].cat.categories.str[:2].is_unique \
+        else base['차수'].astype(object).str[:2].astype('category')  # 계약, 1차, 2차, 잔금
+    return base
+
+def monthly_table(rows):
+    """상품 x 구분(약정원금/납부원금) x 약정월(YYYY-MM) 표, 백만원"""
+    g = (rows.groupby(['상품', '약정월'], observed=True)[['약정금액', '납부원금']].sum()
+         .rename(columns={'약정금액': '약정원금'}).rename_axis(columns='구분'))
+    table = g.stack().unstack('약정월', fill_value=0) / 1_000_000
+    table.columns = table.columns.strftime('%Y-%m')
+    table = table.reset_index()
+    table['상품'] = pd.Categorical(table['상품'].astype(object), categories=PRODUCT_ORDER, ordered=True)
+    table['구분'] = pd.Categorical(table['구분'], categories=DONGHO_TYPES, ordered=True)
+    return table.sort_values(by=['상품', '구분']).reset_index(drop=True)
+
+def dongho_monthly(name):
+    return cached_frame(f'{name}_월별', lambda: monthly_table(dongho_base(name)), SHEETS[name]['ttl'], source=name)
+
+def dongho_midpay(name):
+    """상품별 중도금(차수에 '차' 포함) 납부원금과 합계 행, 백만원"""
+    def build():
+        base = dongho_base(name)
+        paid = base[base['차수'].str.contains('차', na=False)].groupby('상품', observed=True)['납부원금'].sum()
+        paid.index = paid.index.astype(object)
+        paid.loc['합계'] = paid.sum()
+        return (paid / 1_000_000).rename_axis('상품').reset_index()
+    return cached_frame(f'{name}_중도금', build, SHEETS[name]['ttl'], source=name)
+
+def dongho_units(name):
+    """동호수 x 차수구분 납부원금 표 (계약 먼저, 행/열 합계 포함), 백만원"""
+    def build():
+        g = dongho_base(name).groupby(['동호수', '상품', '차수구분'], observed=True)['납부원금'].sum() / 1_000_000
+        table = g.unstack('차수구분', fill_value=0)
+        table.columns = table.columns.astype(object)
+        if '계약' in table.columns:
+            table = table[['계약'] + [c for c in table.columns if c != '계약']]
+        table['합계'] = table.sum(axis=1)
+        totals = table.sum()
+        table = table.reset_index()
+        table['동호수'] = unit_label(table['동호수']).to_numpy()
+        table['상품'] = table['상품'].astype(object)
+        table.loc[len(table)] = {'동호수': '합계', '상품': '', **totals}
+        return table
+    return cached_frame(f'{name}_동호별', build, SHEETS[name]['ttl'], source=name)
+
+def dongho_views(name):
+    return dongho_monthly(name), dongho_midpay(name), dongho_units(name)
+
+# 월별 표: 전월 말까지 도래한 월은 회색, 이후 월은 흰색, 납부원금 행은 연노랑
+PAID_ROW = {'where': ('구분', ['납부원금']), 'css': 'color: lightyellow;'}
+
+def month_rules(until):
+    return [{'months_until': until, 'css': 'color: #9E9E9E;', 'else': 'color: white;'}, PAID_ROW]
+
+def dongho_tables(name, until):
+    """현장 월별/중도금/동호별 표를 스타일까지 입혀서 (집계 표가 다시 만들어지면 함께 만료)"""
+    ttl = SHEETS[name]['ttl']
+    return (cached_table(f'{name}_월별|{until:%Y-%m}', lambda: dongho_monthly(name), ttl,
+                         source=f'{name}_월별', rules=month_rules(until)),
+            cached_table(f'{name}_중도금|표', lambda: dongho_midpay(name), ttl, source=f'{name}_중도금'),
+            cached_table(f'{name}_동호별|표', lambda: dongho_units(name), ttl, source=f'{name}_동호별', blank_zero=True))
+
+def dongho_cube():
+    """전 현장 (현장, 상품, 약정월)별 약정금액/납부원금. 어느 현장 시트가 갱신되어도 다시 만든다."""
+    names = tuple(DONGHO_SITES.values())
+    return cached_frame('동호약정_전체', build_dongho_cube, min(SHEETS[n]['ttl'] for n in names), source=names)
+
+def build_dongho_cube():
+    # 스프레드시트가 다른 현장끼리는 동시에 적재 (같은 스프레드시트는 첫 조회에서 묶음으로 받음)
+    groups = list(group_by_spreadsheet(DONGHO_SITES.values()).values())
+    with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix='dongho') as pool:
+        loaded = pool.map(lambda group: {name: dongho_base(name) for name in group}, groups)
+        bases = {name: base for part in loaded for name, base in part.items()}
+    rows = pd.concat([bases[name][['상품', '약정월', '약정금액', '납부원금']].assign(현장=site)
+                      for site, name in DONGHO_SITES.items()], ignore_index=True)
+    return rows.groupby(['현장', '상품', '약정월'], observed=True)[['약정금액', '납부원금']].sum().reset_index()
+
+def dongho_all_monthly():
+    names = tuple(DONGHO_SITES.values())
+    return cached_frame('동호약정_전체_월별', lambda: monthly_table(dongho_cube()),
+                        min(SHEETS[n]['ttl'] for n in names), source=names)
+
+def dongho_all_table(until):
+    names = tuple(DONGHO_SITES.values())
+    return cached_table(f'동호약정_전체_월별|{until:%Y-%m}', dongho_all_monthly,
+                        min(SHEETS[n]['ttl'] for n in names), source='동호약정_전체_월별', rules=month_rules(until))
+
+
+# --- 자금수지 집계 ---
+# 영업수지를 (사업명, 기준월, 구분, 집행월) cube로 한 번 만들어 두고 당월/전월/변동 표와 차트는 잘라서 쓴다.
+# 금액: 전망 금액 (수입누계/지출누계/과부족/누계과부족 행 포함), 변동: 직전 기준월 전망 대비 증감
+CASH_KEYS = ['사업명', '기준월', '구분', '집행월']
+CASH_CUMULATIVE = ['수입누계', '지출누계', '누계과부족']
+CASH_ALWAYS = ['과부족', '누계과부족']  # 값이 모두 0이어도 표시
+
+def cash_cube():
+    return cached_frame('자금수지_cube', build_cash_cube, SHEETS['자금수지']['ttl'], source='자금수지')
+
+def build_cash_cube():
+    df = dataset_frame('자금수지')
+    df = df[df['수지구분'] == '영업수지']
+    plan = ['사업명', '기준월']
+    wide = widen_ints(df.groupby(plan + ['집행월', '구분'], observed=True)['금액'].sum()).unstack('구분', fill_value=0)
+    wide.columns = wide.columns.astype(object)
+    wide.index = wide.index.set_levels([wide.index.levels[i].astype(object) for i in range(2)], level=plan)
+    income = [c for c in wide.columns if '수입' in c]
+    expense = [c for c in wide.columns if '지출' in c]
+    net = wide[income].sum(axis=1) - wide[expense].sum(axis=1)
+    by_plan = lambda s: s.groupby(level=plan, sort=False).cumsum()
+    wide = wide.assign(수입누계=by_plan(wide[income].sum(axis=1)), 지출누계=by_plan(wide[expense].sum(axis=1)),
+                       과부족=net, 누계과부족=by_plan(net))
+    order = income + ['수입누계'] + expense + ['지출누계'] + CASH_ALWAYS
+    amount = wide[order].rename_axis(columns='구분').stack().reorder_levels(CASH_KEYS)
+
+    # 변동: 사업별 직전 기준월 전망을 그 사업의 다음 기준월로 옮겨 빼면 양쪽 중 한쪽에만 있는 셀도 함께 계산된다
+    plans = amount.index.droplevel(['구분', '집행월']).unique().to_frame(index=False).sort_values(plan)
+    plans['다음'] = plans.groupby('사업명')['기준월'].shift(-1)
+    plans = plans.dropna(subset=['다음'])
+    following = plans.set_index(plan)['다음']
+    prior = amount[amount.index.droplevel(['구분', '집행월']).isin(following.index)].reset_index(name='금액')
+    prior['기준월'] = following.reindex(pd.MultiIndex.from_frame(prior[plan])).to_numpy()
+    change = amount.sub(prior.set_index(CASH_KEYS)['금액'], fill_value=0)
+    compared = pd.MultiIndex.from_frame(plans[['사업명', '다음']])  # 사업별 첫 기준월은 비교 대상 없음 (NaN)
+    change = change[change.index.droplevel(['구분', '집행월']).isin(compared)]
+
+    cube = pd.DataFrame({'금액': amount, '변동': change}).reset_index()
+    cube['금액'] = cube['금액'].fillna(0)
+    cube['구분'] = pd.Categorical(cube['구분'], categories=order, ordered=True)
+    return cube.set_index(CASH_KEYS).sort_index()
+
+def cash_table(pj, month, start, measure='금액'):
+    """구분 x 집행월(YYYY-MM, start 이후) + 총합계. 누계 행의 총합계는 마지막 누계값. 없으면 빈 표"""
+    try:
+        values = cash_cube().loc[(pj, month), measure]
+    except KeyError:
+        return pd.DataFrame()
+    if values.isna().all():
+        return pd.DataFrame()
+    table = values.unstack('집행월', fill_value=0)
+    table.index = table.index.astype(object)
+    total = np.where(table.index.isin(CASH_CUMULATIVE), table.iloc[:, -1], table.sum(axis=1))
+    keep = table.ne(0).any(axis=1) | table.index.isin(CASH_ALWAYS)
+    shown = table.loc[keep, table.columns > pd.Timestamp(start)]
+    shown.columns = shown.columns.strftime('%Y-%m')
+    return shown.assign(총합계=total[keep]).rename_axis(index=None, columns=None)
+
+def previous_plan(pj, month):
+    """변동 계산에 쓰인 그 사업의 직전 기준월 (없으면 None)"""
+    try:
+        months = cash_cube().loc[pj].index.unique('기준월')
+    except KeyError:
+        return None
+    earlier = months[months < month]
+    return earlier.max() if len(earlier) else None
+
+def cash_balance(pj, month):
+    """집행월별 누계과부족 (차트용)"""
+    return cash_cube().loc[(pj, month, '누계과부족'), '금액']
+
+
+# --- pjcode 워크시트 ---
+PJCODE_KEY = SHEETS['pj_pair']['key']
+
+@st.cache_resource
+def get_worksheet(key, title):
+    """워크시트 핸들 (탭 메타데이터 조회는 한 번만)"""
+    return get_spreadsheet(key).worksheet(title)
+
+def pjcode_frame():
+    return cached_frame('pjcode', lambda: pd.DataFrame(get_worksheet(PJCODE_KEY, 'pjcode').get_all_records()), 3600)
+
+def pair_frame():
+    """등록된 (pj, pjo) 쌍. 빈 셀(결측/공백)이 있는 행은 제외"""
+    pairs = dataset_frame('pj_pair')[['pj', 'pjo']].dropna(subset=['pj', 'pjo'])
+    pairs = pd.DataFrame({col: pairs[col].astype(str).str.strip() for col in ['pj', 'pjo']}).drop_duplicates()
+    return pairs[(pairs['pj'] != '') & (pairs['pjo'] != '')]
+
+# 양방향 쌍 인덱스 (pj -> pjo 여러 개, pjo -> pj). 둘 다 pj_pair 파생이라 pjcode 저장이 시트에 반영되면 함께 제거
+def pair_index():
+    """등록된 (pj, pjo) 쌍 인덱스 (중복 확인, pj -> pjo 조회용)"""
+    return cached_frame('pj_pair_index', lambda: pair_frame().set_index(['pj', 'pjo']).sort_index(),
+                        SHEETS['pj_pair']['ttl'], source='pj_pair')
+
+def pair_reverse():
+    """(pjo, pj) 인덱스 (pjo -> pj 조회용)"""
+    return cached_frame('pj_pair_reverse', lambda: pair_frame().set_index(['pjo', 'pj']).sort_index(),
+                        SHEETS['pj_pair']['ttl'], source='pj_pair')
+
+def option_projects(pj):
+    """본공사 pj의 옵션공사 목록 (없으면 빈 목록)"""
+    index = pair_index().index
+    return index[index.get_level_values('pj') == pj].get_level_values('pjo').tolist() if pj in index.levels[0] else []
+
+def main_project(name):
+    """옵션공사로 등록된 이름이면 본공사 pj, 아니면 그대로"""
+    index = pair_reverse().index
+    return index[index.get_level_values('pjo') == name][0][1] if name in index.levels[0] else name
+
+
+# --- pj_pair 쓰기 대기열 (write-behind) ---
+# 저장은 로컬 대기열 파일에 바로 기록하고, 백그라운드 스레드가 모아서 append_rows 한 번으로 시트에 반영한다.
+# 반영 전에 앱이 재시작되어도 파일에 남은 행은 다음 주기에 전송된다.
+PAIR_QUEUE_FILE = os.path.join(SNAPSHOT_DIR, 'pj_pair_queue.csv')
+PAIR_FLUSH_INTERVAL = 10
+
+class PairQueue:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._rows = []
+        self.last_error = None       # 마지막 반영 실패 내용 (성공하면 지움)
+        self.last_error_at = None
+        self.last_flush_at = None    # 마지막 반영 성공 시각
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                self._rows = [tuple(row) for row in csv.reader(f) if row]
+        # 이전 프로세스가 시트 반영 후 대기열 파일을 고쳐 쓰기 전에 종료됐을 수 있으므로 첫 반영은 시트 최신본과 대조
+        self._resumed = bool(self._rows)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(self._rows)
+        os.replace(tmp_path, self.path)
+
+    def pending(self):
+        with self._lock:
+            return list(self._rows)
+
+    def add(self, pj, pjo):
+        """대기열에 추가 (pj, pjo는 앞뒤 공백을 제거해서 넘김). 이미 시트나 대기열에 있는 쌍이면 False
+        확인과 추가를 한 잠금 안에서 하므로 같은 쌍을 동시에 저장해도 한 번만 들어간다.
+        (pair_index가 시트를 새로 읽는 동안은 다른 저장과 대기 건수 조회가 잠시 기다림)"""
+        pair = (pj, pjo)
+        with self._lock:
+            if pair in self._rows or pair in pair_index().index:
+                return False
+            self._rows.append(pair)
+            self._save()
+        self._wake.set()
+        return True
+
+    def flush(self):
+        """대기 중인 행을 한 번의 append_rows로 시트에 반영. 실패하면 대기열에 남겨 다음 주기에 재시도
+        이미 시트에 있는 쌍은 보내지 않는다. (시트 반영 직후 대기열 파일을 고쳐 쓰기 전에 종료되면
+        재시작 후 같은 행을 다시 보내게 되므로)"""
+        with self._flush_lock:
+            rows = self.pending()
+            if not rows:
+                return 0
+            if self._resumed:
+                invalidate_dataset('pj_pair')
+                self._resumed = False
+            registered = pair_index().index
+            send = [list(row) for row in rows if row not in registered]
+            if send:
+                get_worksheet(PJCODE_KEY, 'pj_pair').append_rows(send)
+                invalidate_dataset('pj_pair')
+            with self._lock:
+                del self._rows[:len(rows)]  # 전송 중 추가된 행은 남김
+                self._save()
+            self.last_flush_at, self.last_error = time.time(), None
+            return len(rows)
+
+    def run(self):
+        while True:
+            self._wake.wait(PAIR_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # 대기열은 그대로 두고 다음 주기에 재시도, 실패 내용은 pjcode 화면에 표시
+                self.last_error, self.last_error_at = f'{type(e).__name__}: {e}', time.time()
+
+@st.cache_resource
+def pair_queue():
+    """서버 프로세스당 한 번, 대기열과 반영 스레드를 띄운다."""
+    queue = PairQueue(PAIR_QUEUE_FILE)
+    threading.Thread(target=queue.run, name='pj-pair-writer', daemon=True).start()
+    return queue
+
+# --- 로그인 직후 전체 데이터셋 병렬 프리페치 ---
+PREFETCH_WORKERS = 6
+
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+
+def warm_dataset(name):
+    dataset_frame(name)
+
+# 원본 데이터셋 -> 미리 만들어 둘 파생 프레임
+DERIVED_FRAMES = {
+    'alv': [alv_items, alv_projects, pnl_cube],
+    '추진일정': [schedule_long],
+    '분양': [sales_cubes, sales_trend],
+    '자금수지': [cash_cube],
+    **{name: [lambda name=name: dongho_views(name), lambda name=name: dongho_tables(name, last_month_end())]
+       for name in DONGHO_SITES.values()},
+}
+
+def warm_group(names):
+    # 첫 미스에서 같은 스프레드시트의 탭을 묶음 조회하므로 나머지는 스냅샷에서 바로 적재됨
+    for name in names:
+        warm_dataset(name)
+        for build in DERIVED_FRAMES.get(name, []):
+            build()
+
+def prefetch_datasets(names=None):
+    """카탈로그 데이터셋을 스프레드시트 단위로 스레드풀에 올려 공용 캐시를 채운다. (기다리지 않음)"""
+    executor = get_prefetch_executor()
+    return [executor.submit(warm_group, group) for group in group_by_spreadsheet(names or SHEETS).values()]
+
+start_snapshot_sync()
+pair_queue()  # 재시작 전 대기열 파일에 남은 행도 pjcode 화면을 열지 않아도 반영되도록
+if not st.session_state.get('prefetched'):
+    prefetch_datasets()
+    st.session_state.prefetched = True
+
 # --- 사이드바(로그인후) ---
 
 with st.sidebar:
@@ -396,37 +1817,69 @@ with st.sidebar:
                        #icons=["dash","info-circle", "bank", "bank", "bank", "bank","bank","house","house","house","house"],
                        icons=["dash"] + ["info-circle"]*len(items),
                        menu_icon="cast", default_index=0)
+
+        # 공용 캐시 현황 및 수동 새로고침
+        with st.expander("데이터 캐시"):
+            cache = get_sheet_cache()
+            st.caption(f"사용량: {cache.used_bytes / 1024**2:,.1f} / {SHEET_CACHE_MAX_MB} MB")
+            st.dataframe(cache.stats(), use_container_width=True, hide_index=True)
+            st.caption("데이터셋별 메모리 (원본 → 압축)")
+            st.dataframe(memory_report_frame(), use_container_width=True, hide_index=True)
+            for failure in list(batch_errors().values()):
+                failed_at = datetime.datetime.fromtimestamp(failure['at']).strftime('%m-%d %H:%M:%S')
+                st.error(f"⚠️ 묶음 조회 실패 ({failed_at}, 탭별 조회로 대체): {', '.join(failure['names'])} - {failure['error']}")
+            if st.button("🔄 데이터 새로고침", use_container_width=True):
+                invalidate_dataset()
+                st.rerun()
+            if st.button("💾 스냅샷 동기화", use_container_width=True):
+                with st.spinner('시트 → 스냅샷 동기화 중...'):
+                    results = sync_snapshots(force=True)
+                cache.invalidate()
+                st.dataframe(pd.Series(results, name='결과'), use_container_width=True)
 # --- 메뉴별 로직 ---
 if menu == "pjcode":
     st.subheader('📊 pjcode 조회/입력')            
-    # 1. 인증 및 시트 연결
-    client = get_gspread_client()
-    spreadsheet_id = '1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM'
-    spreadsheet = client.open_by_key(spreadsheet_id)  #구글시트에 쓰기.
-        
+    # 워크시트별로 공용 캐시에 보관 (대기열이 시트에 반영될 때 pj_pair만 무효화)
     col1, col2, col3, col4 = st.columns([2,2,4,2])
     with col1:
         st.write('🔎 pjcode 목록')
-        sheet = spreadsheet.worksheet("pjcode")
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)        
-        st.dataframe(df, use_container_width=True, hide_index=True, height=600)   
+        st.dataframe(pjcode_frame(), use_container_width=True, hide_index=True, height=600)   
         
     with col2:
         st.write('🔎 alv 목록')
-        sheet = spreadsheet.worksheet("alv")
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
-        df_col = df['프로젝트 내역'].drop_duplicates()
-        st.dataframe(df_col, use_container_width=True, hide_index=True, height=600)   
+        st.dataframe(alv_projects(), use_container_width=True, hide_index=True, height=600)   
         
+    # 입력을 먼저 처리해야 같은 실행에서 col3 목록에 반영된다. (st.rerun 불필요)
+    with col4:  
+        st.write('➕ pj_pair 신규입력')
+        with st.container():
+            pj = st.text_input('본공사 입력:').strip()
+            pjo = st.text_input('옵션공사 입력:').strip()
+            if st.button('저장'):
+                if pj and pjo:
+                    # 시트 반영은 백그라운드에서 (화면은 대기열 기준으로 바로 갱신)
+                    if pair_queue().add(pj, pjo):
+                        st.success(f"✅ 저장 성공: {pj} / {pjo}")
+                        st.balloons()                        
+                    else:
+                        st.warning(f"⚠️ 이미 등록된 쌍입니다: {pj} / {pjo}")
+                else:
+                    st.warning("⚠️ 본공사와 옵션공사 코드를 모두 입력해주세요.")
+
     with col3:
         st.write('🔎 등록된 pj_pair 목록')
         try:            
-            sheet = spreadsheet.worksheet("pj_pair")
-            data = sheet.get_all_records()
-            if data:
-                df_view = pd.DataFrame(data)                
+            queue = pair_queue()
+            pending = queue.pending()
+            df_view = pd.concat([load_sheet('pj_pair'), pd.DataFrame(pending, columns=['pj', 'pjo'])], ignore_index=True)
+            if pending:
+                st.caption(f"⏳ 시트 반영 대기 {len(pending)}건")
+            if queue.last_error:
+                failed_at = datetime.datetime.fromtimestamp(queue.last_error_at).strftime('%m-%d %H:%M:%S')
+                st.error(f"⚠️ 시트 반영 실패 ({failed_at}, 재시도 중): {queue.last_error}")
+            if queue.last_flush_at:
+                st.caption(f"마지막 시트 반영: {datetime.datetime.fromtimestamp(queue.last_flush_at).strftime('%m-%d %H:%M:%S')}")
+            if not df_view.empty:
                 # [선택] 최신 입력값이 위로 오게 하려면 (역순 정렬)
                 df_view = df_view.iloc[::-1]                
                 # 데이터프레임 출력
@@ -435,38 +1888,16 @@ if menu == "pjcode":
                 st.info("현재 등록된 데이터가 없습니다.")
         except Exception as e:
             st.error(f"데이터 로드 중 오류 발생: {e}")
-        
-    with col4:  
-        st.write('➕ pj_pair 신규입력')
-        with st.container():
-            pj = st.text_input('본공사 입력:')
-            pjo = st.text_input('옵션공사 입력:')                    
-            if st.button('저장'):
-                if pj and pjo:
-                    try:                        
-                        # 데이터 쓰기 (append_row 사용)                        
-                        new_row = [pj, pjo]
-                        sheet.append_row(new_row)                                            
-                        st.success(f"✅ 저장 성공: {pj} / {pjo}")
-                        st.balloons()                        
-                        # [중요] 저장 후 화면 갱신을 위해 재실행
-                        st.rerun()                         
-                    except Exception as e:
-                        st.error(f"❌ gspread 쓰기 오류 발생: {e}")
-                else:
-                    st.warning("⚠️ 본공사와 옵션공사 코드를 모두 입력해주세요.")
 
 
 elif menu == "사업개요":
     st.subheader('📊 사업개요')
-    url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=0#gid=0"    
-    
-    data = conn.read(spreadsheet=url, usecols=list(range(15))).fillna("")        
+    data = load_sheet('사업개요').fillna("")        
+    show_as_of('사업개요')
     pj_list = ["전체 조회"] + data['사업명'].drop_duplicates().tolist()        
     sel_pj = st.selectbox('조회할 사업명을 선택하세요', pj_list)        
     
     if st.button('조회'):
-        data2 = conn.read(spreadsheet=url, usecols=[1] + list(range(17, 41))).fillna("")        
         # 필터링 조건 설정
         is_all = sel_pj == "전체 조회"  #sel_pj이 "전체 조회"인지 확인합니다.결과는 True 또는 False (Boolean) 값으로 is_all 변수에 저장
         dff = data if is_all else data[data['사업명'] == sel_pj] #파이썬 삼항연산자        
@@ -475,11 +1906,14 @@ elif menu == "사업개요":
                 col1, col2, col3 = st.columns([3, 3, 2])                
                 with col1:
                     st.write(f"### 조감도")                    
-                    img_path = f"image/{sel_pj}.jpg"
                     try:
                         #st.image(os.path.join(os.getcwd(), "image", sel_pj+".jpg"), width=50)
-                        st.image(img_path, use_container_width=True)
-                    except:
+                        img = project_image(sel_pj)
+                    except Exception:
+                        img = None
+                    if img:
+                        st.image(img, use_container_width=True)
+                    else:
                         st.warning("등록된 조감도가 없습니다.")
                 
                 with col2:
@@ -490,39 +1924,39 @@ elif menu == "사업개요":
                 
                 with col3:
                     st.subheader('추진일정')
-                    row2 = data2[data2['사업명'] == sel_pj]
-                    
-                    if not row2.empty:
-                        row = row2.iloc[0]
-                        schedules = []
-                        for i in range(1, 13):
-                            d_col, n_col = f'일정{i}', f'일정명{i}'
-                            if row.get(d_col) and row.get(n_col):
-                                date_val = str(row[d_col])[:10]
-                                if "1900-01" not in date_val:
-                                    schedules.append({"날짜": date_val, "일정명": row[n_col]})
-                        
-                        df_schedule = pd.DataFrame(schedules)
-                        if not df_schedule.empty:
-                            st.dataframe(df_schedule, use_container_width=True, hide_index=True)
-                        else:
-                            st.info("등록된 추진 일정이 없습니다.")
+                    df_schedule = project_schedule(sel_pj)[['날짜', '일정명']]
+                    if not df_schedule.empty:
+                        st.dataframe(df_schedule.assign(날짜=df_schedule['날짜'].dt.strftime('%Y-%m-%d')),
+                                     use_container_width=True, hide_index=True)
+                    else:
+                        st.info("등록된 추진 일정이 없습니다.")
             else:
                 # 전체 목록 표시
                 st.info("전체 목록을 표시합니다.")
                 st.dataframe(dff, use_container_width=True, hide_index=True)
+
+                # 전체 사업 추진일정 타임라인
+                st.subheader('전체 추진일정')
+                timeline = schedule_long().reset_index()
+                if not timeline.empty:
+                    fig = px.scatter(timeline, x='날짜', y='사업명', color='사업명', hover_name='일정명',
+                                     template="plotly_white")
+                    fig.add_vline(x=pd.Timestamp.today().normalize(), line_dash='dot', line_color='red')
+                    fig.update_layout(showlegend=False, height=max(300, 30 * timeline['사업명'].nunique()),
+                                      yaxis=dict(title=None, categoryorder='category descending'))
+                    st.plotly_chart(fig, use_container_width=True)
+                    upcoming = timeline[timeline['날짜'] >= pd.Timestamp.today().normalize()].sort_values('날짜')
+                    st.write('예정 일정')
+                    st.dataframe(upcoming[['날짜', '사업명', '일정명']].assign(날짜=upcoming['날짜'].dt.strftime('%Y-%m-%d')),
+                                 use_container_width=True, hide_index=True)
         else:
             st.error("결과를 찾을 수 없습니다.")
 
 
 elif menu == "PF현황":
     st.subheader('📊 PF현황 조회')
-    url = "https://docs.google.com/spreadsheets/d/1G4GJIXw36pKUoPgAR2I8yQ0zcTKoscwAoNW5nu7oNPI/edit?gid=0#gid=0"
-    ddf = conn.read(spreadsheet=url, usecols=[0,1,2,3,4,5,6,7,11,12,14])
-    ncols = ['약정','기표','상환','잔액']  #숫자칼럼 명시
-    for col in ncols:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)    
+    ddf = load_sheet('PF현황')
+    show_as_of('PF현황')
     
     col1, col2 = st.columns(2)
     pj_list = ddf['PJ명'].drop_duplicates().tolist()        
@@ -549,160 +1983,61 @@ elif menu == "PF현황":
 elif menu == "동호약정납부":
     st.subheader('📊 동호약정 납입현황')
     
-    sid = {
-        '벤처밸리': 'https://docs.google.com/spreadsheets/d/1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM/edit?gid=0#gid=0',
-        '시민공원': 'https://docs.google.com/spreadsheets/d/1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM/edit?gid=767298303#gid=767298303',
-        '시화디오션': 'https://docs.google.com/spreadsheets/d/1N1qhgvhoVBWtuF6LfBPjaRGX6kawiUWpc0bJb8vBDgM/edit?gid=1762659893#gid=1762659893',
-        }
-    opt = sid.keys()
+    # 현장 목록은 카탈로그(SHEETS의 동호약정_<현장>)에서
+    opt = [ALL_SITES] + list(DONGHO_SITES)
     sel_pj = st.selectbox('사업명 선택', opt)
 
     if st.button('조회'):
-        url = sid[sel_pj]      
-        ddf = conn.read(spreadsheet=url)    
-        df = ddf[ddf['동']!='합계']
-
-        # [수정 포인트 1] 그룹화하기 전, 가장 먼저 숫자형으로 변환합니다.
-        # 금액 컬럼들에 콤마(,)가 있을 수 있으므로 제거 후 변환합니다.
-        numeric_cols = ["약정금액", "납부원금"] 
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        
-        #df["동호수"] = df["동"].astype(str) + "-" + df["호수"].astype(str)
-        # fillna(0)는 결측치가 있을 경우 에러를 방지하기 위함입니다.
-        df["동호수"] = (
-            df["동"].fillna(0).astype(int).astype(str) + 
-            "-" + 
-            df["호수"].fillna(0).astype(int).astype(str).str.zfill(4))
-        
-        
-        
-        df["상품"] = df["세대속성"].str.split("/").str[0]    
-        df = df[df["주택형"] != "소계"].copy()    
-        df["약정일자"] = pd.to_datetime(df["약정일자"])    
-        df["약정월"] = df["약정일자"] + pd.offsets.MonthEnd(0) 
-
-        # [포인트 2] 이제 그룹화를 하면 숫자로 합산됩니다.
-        dfg = df.groupby(["상품", "약정월", "차수", "동호수"], as_index=False).agg({
-            "약정금액": "sum",
-            "납부원금": "sum"})
-        dfg = dfg[dfg["약정월"].notnull()]
-        dfg = dfg.sort_values("약정월")    
-        dfg["차수구분"] = dfg["차수"].str[:2]  #계약, 1차, 2차, 잔금
-        # [포인트 3] 재그룹화
-        dfg2 = dfg.groupby(["상품", "약정월", "차수", "차수구분"], as_index=False).agg({
-            "납부원금": "sum",
-            "약정금액": "sum"}).rename(columns={"약정금액": "약정원금"})    
-        dfg2 = dfg2.sort_values(["상품", "약정월"])        
-        df_melted = dfg2.melt(id_vars=['상품', '약정월'], value_vars=['약정원금', '납부원금',], var_name='구분')        
-        # 날짜를 문자열로 변환 (YYYY-MM)
-        df_melted['약정월'] = df_melted['약정월'].dt.strftime('%Y-%m')        
-        # 피벗 테이블 생성
-        dfp = df_melted.pivot_table(
-            index=['상품', '구분'], 
-            columns='약정월', 
-            values='value', 
-            aggfunc='sum', 
-            fill_value=0
-        )
-        # 14. 백만원 단위 변환 및 출력
-        dfp = dfp / 1000000          
-        dfp = dfp.reset_index()
-
-        custom_product_order = ['아파트', '오피스텔', '생활숙박시설', '지식산업센터', '판매시설', '상가']
-        custom_type_order = ['약정원금', '납부원금'] # 약정원금이 앞으로 오도록 설정
-        # 3. 카테고리 설정 (상품 & 구분 둘 다 적용)
-        dfp['상품'] = pd.Categorical(dfp['상품'], categories=custom_product_order, ordered=True)
-        dfp['구분'] = pd.Categorical(dfp['구분'], categories=custom_type_order, ordered=True)
-        # 4. [핵심] 상품 순서대로 먼저, 그 안에서 구분 순서대로 정렬
-        dfp = dfp.sort_values(by=['상품', '구분']).reset_index(drop=True)
-        # 1. 오늘 기준 전월 말일 계산
-        today = datetime.date.today()
-        first_day_of_this_month = today.replace(day=1)
-        last_day_of_last_month = first_day_of_this_month - datetime.timedelta(days=1)
-        # 비교를 위해 Timestamp 형식으로 변환
-        threshold_date = pd.Timestamp(last_day_of_last_month)        
-        
-        def highlight_row(row):
-            # '구분' 컬럼이 '납부원금'이면 lightyellow, 아니면 빈 문자열(기본값)
-            color = 'color: lightyellow' if row['구분'] == '납부원금' else ''
-            return [color] * len(row)
-
-        # 3. 스타일 적용 및 출력
-        # 기존 style_by_date(열 기준 스타일)와 highlight_row(행 기준 스타일)를 체이닝하여 적용
-        styled_dfp = (dfp.style
-                      .apply(style_by_date, axis=0)        # 날짜 기준 열 스타일 (기존)
-                      .apply(highlight_row, axis=1)        # '납부원금' 기준 행 스타일 (추가)
-                      .format(thousands=",", precision=0))
-        
+        is_all = sel_pj == ALL_SITES
+        show_as_of(*(DONGHO_SITES.values() if is_all else [DONGHO_SITES[sel_pj]]))
+        # 시트 갱신 시 한 번 집계하고 스타일까지 입혀 둔 표 (전월 말일 기준으로 음영)
+        threshold_date = last_month_end()
+        if is_all:
+            styled_dfp = dongho_all_table(threshold_date)
+        else:
+            styled_dfp, styled_dfp2, styled_dfp3 = dongho_tables(DONGHO_SITES[sel_pj], threshold_date)
         st.dataframe(styled_dfp, use_container_width=True, hide_index=True)        
         
                 
-        c1, c2 = st.columns([3,7])
-        with c1:
-            st.subheader('상품별 중도금납부현황')
-            df_mid = dfg[dfg['차수'].str.contains('차', na=False)].copy()
-            df_mid = df_mid[['동호수','상품','차수','차수구분','납부원금']]        
-            #df_mid.rename(columns={'납부원금': '납부중도금'}, inplace=True)
-            dfp2 = df_mid.pivot_table(index=['상품'], values='납부원금', aggfunc='sum',fill_value=0, margins=True, margins_name='합계').reset_index()
-            dfp2_disp = dfp2.copy()
-            dfp2_disp['납부원금'] = dfp2_disp['납부원금'] / 1000000            
-            st.dataframe(dfp2_disp.style.format(precision=0, thousands=","), use_container_width=True, hide_index=True)                    
-        
-        with c2:
-            st.subheader('동호별 납부현황')                                     
-            
-            # 1. 단위 변환 (중복 계산 방지 위해 별도 변수 권장하나 기존 흐름 유지)
-            df_c2 = dfg.copy()
-            df_c2['납부원금'] = df_c2['납부원금'] / 1000000 
-            
-            # 2. 피벗 테이블 생성
-            dfp3 = df_c2.pivot_table(
-                index=['동호수', '상품'], 
-                columns='차수구분', 
-                values='납부원금', 
-                aggfunc='sum',
-                fill_value=0, 
-                margins=True, 
-                margins_name='합계'
-            ).reset_index()            
-            
-            # 3. 컬럼 순서 재배치 (계약 컬럼 위치 조정)
-            cols = dfp3.columns.tolist()
-            if "계약" in cols:
-                cols.insert(2, cols.pop(cols.index("계약")))            
-            dfp3 = dfp3[cols]          
+        if is_all:
+            # 현장별 약정/납부 (전월 말까지 도래분 기준)
+            st.subheader('현장별 납부현황')
+            cube = dongho_cube()
+            due = cube[cube['약정월'] <= pd.Period(threshold_date, 'M')]
+            by_site = due.groupby('현장')[['약정금액', '납부원금']].sum().rename(columns={'약정금액': '약정원금'}) / 1_000_000
+            by_site['납부율(%)'] = (by_site['납부원금'] / by_site['약정원금'] * 100).round(1)
+            st.dataframe(style_table(by_site.reset_index(), formats={'납부율(%)': '.1f'}),
+                         use_container_width=True, hide_index=True)
+            trend = cube.groupby('약정월')[['약정금액', '납부원금']].sum().cumsum() / 1_000_000
+            trend = trend.rename(columns={'약정금액': '약정원금'}).reset_index()
+            trend['약정월'] = trend['약정월'].dt.to_timestamp()
+            fig = px.line(trend, x='약정월', y=['약정원금', '납부원금'], template="plotly_white", markers=True)
+            fig.update_layout(yaxis=dict(title='누계 (백만원)', tickformat=',d'), xaxis=dict(tickformat='%Y-%m'), legend_title_text='')
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            c1, c2 = st.columns([3,7])
+            with c1:
+                st.subheader('상품별 중도금납부현황')
+                st.dataframe(styled_dfp2, use_container_width=True, hide_index=True)                    
         
-            # 4. 스타일 적용 (0은 빈칸으로, 숫자는 콤마 적용)
-            # subset을 사용하여 '동호수', '상품' 컬럼은 포맷팅 대상에서 제외합니다.
-            numeric_cols = [c for c in dfp3.columns if c not in ['동호수', '상품']]
-            
-            styled_dfp3 = dfp3.style.format(
-                lambda x: f"{x:,.0f}" if x != 0 else "", 
-                subset=numeric_cols
-            )
+            with c2:
+                st.subheader('동호별 납부현황')                                     
             
-            st.dataframe(styled_dfp3, use_container_width=True, hide_index=True)
-            #st.dataframe(dfp3.style.format(precision=0, thousands=","), use_container_width=True, height=500)                       
+                # 백만원 단위, 계약 컬럼 우선, 행/열 합계 포함 (0은 빈칸, 숫자는 콤마)
+                st.dataframe(styled_dfp3, use_container_width=True, hide_index=True)
+                #st.dataframe(dfp3.style.format(precision=0, thousands=","), use_container_width=True, height=500)                       
                 
         
 elif menu == "자금수지":
     st.subheader('📊 자금수지 조회')
-    url = "https://docs.google.com/spreadsheets/d/18AhC-xVCGMpapdZwpptxnkED3_sO18B7qDeKz-4oa60/edit?gid=0#gid=0"
-    ddf = conn.read(spreadsheet=url)    
-    ddf = ddf[ddf['수지구분']=='영업수지']  #영업수지만..
+    cube = cash_cube()  # 영업수지만, 새로고침 시 한 번 집계
+    show_as_of('자금수지')
     
-    # 0. 숫자 데이터 전처리
-    ncols = ['금액']
-    for col in ncols:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
 
     # 1. 입력 UI (사업명 및 기준월 선택)
     col1, col2, col3 = st.columns(3)
-    pj_list = ddf['사업명'].drop_duplicates().tolist()
-    unique_months = sorted(ddf['기준월'].unique(), reverse=True)
+    pj_list = cube.index.unique('사업명').tolist()
+    unique_months = sorted(cube.index.unique('기준월'), reverse=True)
     
     with col1: 
         pj = st.selectbox('조회할 사업명을 선택하세요', pj_list)
@@ -713,133 +2048,42 @@ elif menu == "자금수지":
         # 기본값을 '2025-09' 등으로 설정하거나 리스트에서 선택하게 할 수 있습니다.
         print_month = st.date_input('출력 시작월 선택', value=pd.to_datetime('2025-11-30'))
     
-    # 지난달(last_month) 자동 계산 로직
-    if len(unique_months) >= 2:
-        idx = unique_months.index(dday)
-        last_month = unique_months[idx + 1] if idx + 1 < len(unique_months) else unique_months[-1]
-    else:
-        last_month = unique_months[0] if unique_months else None
+    # 지난달(last_month): cube의 변동과 같은 기준, 선택한 사업의 직전 기준월
+    last_month = previous_plan(pj, dday)
     
-    ## --- 2. 가공 및 스타일링 함수 (print_month 변수 사용) ---
-    def make_styled_df(input_df, title_text, start_date):
-        if input_df.empty:
+    ## --- 2. 출력 함수 (cube에서 잘라낸 표) ---
+    def show_cash_table(table, title_text):
+        if table.empty:
             st.warning(f"[{title_text}] 조회된 결과가 없습니다.")
             return
-    
-        # (1) 데이터 타입 변환 및 피벗
-        temp_df = input_df.copy()
-        temp_df['집행월'] = pd.to_datetime(temp_df['집행월'])
-        dfp = temp_df.pivot_table(index='구분', columns='집행월', values='금액', aggfunc='sum', fill_value=0)
-        
-        # 가로 총합계 계산
-        dfp['총합계'] = dfp.sum(axis=1)
-    
-        # (2) 누계 및 과부족 계산
-        original_indices = dfp.index.tolist()
-        calc_rows = []
-        
-        income_rows = [i for i in original_indices if '수입' in i]
-        expense_rows = [i for i in original_indices if '지출' in i]
-        
-        income_total = dfp.loc[income_rows].sum() if income_rows else pd.Series(0, index=dfp.columns)
-        expense_total = dfp.loc[expense_rows].sum() if expense_rows else pd.Series(0, index=dfp.columns)
-    
-        # [수정] 수입소계 제외, 수입누계만 추가
-        if not income_total.sum() == 0:
-            s2 = income_total.cumsum().to_frame().T
-            s2.index = ['수입누계']
-            calc_rows.append(s2)
-    
-        # [수정] 지출소계 제외, 지출누계만 추가
-        if not expense_total.sum() == 0:
-            e2 = expense_total.cumsum().to_frame().T
-            e2.index = ['지출누계']
-            calc_rows.append(e2)
-    
-        # 과부족 및 누계 과부족
-        shortage = (income_total - expense_total).to_frame().T
-        shortage.index = ['과부족']
-        cum_shortage = (income_total - expense_total).cumsum().to_frame().T
-        cum_shortage.index = ['누계과부족']
-        calc_rows.extend([shortage, cum_shortage])
-    
-        # (3) 결합 및 정렬
-        dfp = pd.concat([dfp] + calc_rows)
-        
-        # [수정] 정렬 순서 정의에서 소계 명칭 제거
-        all_indices = dfp.index.tolist()
-        final_order = (
-            [i for i in all_indices if '수입' in i and i != '수입누계'] + ['수입누계'] +
-            [i for i in all_indices if '지출' in i and i != '지출누계'] + ['지출누계'] +
-            ['과부족', '누계과부족']
-        )
-        seen = set()
-        final_order = [x for x in final_order if x in dfp.index and not (x in seen or seen.add(x))]
-        dfp = dfp.reindex(final_order)
-    
-        # (4) 출력 필터링 및 컬럼명 변환
-        sel_cols = [c for c in dfp.columns if (isinstance(c, pd.Timestamp) and c > pd.to_datetime(start_date))]
-        dis_cols = sel_cols + ['총합계']
-        dfp_to_show = dfp[dis_cols].copy()
-        
-        new_columns = []
-        for c in dfp_to_show.columns:
-            if isinstance(c, pd.Timestamp):
-                new_columns.append(c.strftime('%Y-%m'))
-            else:
-                new_columns.append(str(c))
-        dfp_to_show.columns = new_columns
-    
-        # (5) 스타일링 함수
-        def apply_styles(styler):
-            def style_rows(row):                
-                
-                target_names = ['수입', '지출', '과부족']  #음영적용
-                is_highlight = row.name in target_names
-                return ['background-color: lightyellow; color: black; font-weight: bold' if is_highlight else '' for _ in row]
-            return styler.apply(style_rows, axis=1)
-    
-        # (6) 최종 렌더링
+        # 수입/지출/과부족 행 음영, 0은 빈칸
         st.write(f"### {title_text}")
-        if not dfp_to_show.empty:    
-            styled_df = apply_styles(dfp_to_show.style).format(lambda x: f"{x:,.0f}" if x != 0 else "")    
-            st.dataframe(styled_df, use_container_width=True)
-        else:
-            st.info("선택한 출력월 이후의 데이터가 없습니다.")
+        st.dataframe(style_table(table, [CASH_ROWS], blank_zero=True), use_container_width=True)
 
     # 3. 조회 실행
     if st.button('조회'):
-        # 공통 사업명 필터
-        pj_cond = ddf['사업명'].str.contains(pj, na=False, case=False) if pj else True
-        
         # (A) 이번 달 출력
-        cond_now = (ddf['기준월'] == dday) & pj_cond
-        # 마지막 인자로 print_month를 반드시 넣어주어야 합니다.
-        make_styled_df(ddf[cond_now], f"📊 당월전망: {dday}", print_month) 
+        show_cash_table(cash_table(pj, dday, print_month), f"📊 당월전망: {dday}")
         
         # (B) 지난 달 출력
-        if last_month:
-            cond_last = (ddf['기준월'] == last_month) & pj_cond
-            # 여기도 마찬가지로 print_month를 추가합니다.
-            make_styled_df(ddf[cond_last], f"📊 전월전망 ({last_month})", print_month)
+        if last_month is not None:
+            show_cash_table(cash_table(pj, last_month, print_month), f"📊 전월전망 ({last_month})")
+
+        # (C) 전월 전망 대비 변동 (당월 - 전월)
+        if last_month is not None:
+            show_cash_table(cash_table(pj, dday, print_month, '변동'), f"📊 전월대비 변동 ({last_month} → {dday})")
+        else:
+            st.info(f"{pj}의 {dday} 이전 기준월이 없어 전월 비교를 생략합니다.")
             
             
         #차트  
-        cond_now = (ddf['기준월'] == dday) & pj_cond
-        df_now = ddf[cond_now].copy()
-
-        if not df_now.empty:
-            # 데이터 가공: 수입 - 지출 계산
-            df_now['집행월'] = pd.to_datetime(df_now['집행월'])
-            df_chart = df_now.pivot_table(index='집행월', columns='구분', values='금액', aggfunc='sum', fill_value=0)            
-            # 수입/지출 컬럼 존재 여부 확인 후 과부족 계산
-            inc = df_chart['수입'] if '수입' in df_chart.columns else 0
-            exp = df_chart['지출'] if '지출' in df_chart.columns else 0
-            
-            # 월별 누계과부족 계산
-            df_chart['누계과부족'] = (inc - exp).cumsum()
+        try:
+            df_chart = cash_balance(pj, dday).rename('누계과부족').reset_index()
+        except KeyError:
+            df_chart = pd.DataFrame()
+
+        if not df_chart.empty:
             # 출력범위 결정            
-            df_chart = df_chart.reset_index()
             df_chart = df_chart[df_chart['집행월'].dt.year <= datetime.datetime.now().year]            
 
             st.write(f"#### 📈 {dday} 기준 누계과부족 추이")
@@ -874,12 +2118,8 @@ elif menu == "자금수지":
         
 elif menu == "채권":
     st.subheader('📊 채권현황 조회')
-    url = "https://docs.google.com/spreadsheets/d/1RlNYrWWezvHQfceEgmHIkC-c7dnIxRIWZTM3fWdqDWQ/edit?gid=0#gid=0"           
-    ddf = conn.read(spreadsheet=url)
-    ncols = ['채권', '불량', '잔액', '총분양금', '대출잔액']
-    for col in ncols:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)    
+    ddf = load_sheet('채권')
+    show_as_of('채권')
     
     col1, col2 = st.columns(2)
     pj_list = ddf['손익센터명'].drop_duplicates().tolist()        
@@ -905,16 +2145,8 @@ elif menu == "채권":
 elif menu == "중도금":
     st.subheader('🏠 중도금 관리')
     mid_tab = st.selectbox("PJ선택", ["서면", "트라반트", "시민공원"])
-    urls = {
-        "서면": 'https://docs.google.com/spreadsheets/d/1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E/edit?gid=943639489',
-        "트라반트": 'https://docs.google.com/spreadsheets/d/1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E/edit?gid=453535398',
-        "시민공원": 'https://docs.google.com/spreadsheets/d/1P-f6lZCK7ln1iJEPBUtQqVGWNy-g7G_5iBDYLnWZB-E/edit?gid=668236831'
-    }
-    ddf = conn.read(spreadsheet=urls[mid_tab])      
-    ncols =['대출잔액']
-    for col in ncols:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
+    ddf = load_sheet(f"중도금_{mid_tab}")
+    show_as_of(f"중도금_{mid_tab}")
     
     if not ddf.empty:
         # 숫자 컬럼에 대해 콤마 포맷 적용 (%d는 정수형)
@@ -932,12 +2164,8 @@ elif menu == "중도금":
 
 elif menu == "중도금결산":
     st.subheader('🏠 중도금결산자료')
-    url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=67742981"
-    ddf = conn.read(spreadsheet=url)    
-    ncols =['잔액']
-    for col in ncols:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
+    ddf = load_sheet('중도금결산')
+    show_as_of('중도금결산')
 
     pj_list = ddf['사업명'].drop_duplicates().tolist()            
     pj = st.selectbox('조회할 사업명을 선택하세요', pj_list)                   
@@ -956,76 +2184,33 @@ elif menu == "중도금결산":
 
 elif menu == "분양":
     st.subheader('📊 분양현황')
-    url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=391839077#gid=391839077"
-    data = conn.read(spreadsheet=url)   
-           
-    ncols = ['입주증번호','총분양금']
-    for col in ncols:
-        if col in data.columns:
-            data[col] = pd.to_numeric(data[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)    
-
-    pj_list = data['사업명'].drop_duplicates().tolist()    
+    # 사업 목록은 갱신 시 만들어 둔 cube의 인덱스에서 (원본 프레임 사본 없음)
+    pj_list = [ALL_PROJECTS] + sales_cubes().index.unique().tolist()    
+    show_as_of('분양')
+
     pj = st.selectbox('사업명 선택', pj_list)    
     search_btn = st.button('조회')
     
     if search_btn:        
         if pj:            
-            cond = data['사업명'].str.contains(pj, na=False, case=False)                    
-            dff = data[cond]    
-            ibju = dff['입주증번호'].sum()
-            lawsuit = (dff['소송']=='소송').sum() #소송 개수
-            if not dff.empty:                
-                dff_total = dff.groupby('상품')['동호수'].count().reset_index(name='총공급')
-                # 1. 피벗 테이블 생성 (계약여부별 동호수 개수)
-                dfp = dff.pivot_table(
-                    index='상품', 
-                    columns='계약여부', 
-                    values='동호수', 
-                    aggfunc='count',
-                    fill_value=0)        
-                # 2. 비율(%) 계산 및 컬럼 추가 # 행 단위 합계(전체 물량) 계산
-                dfp['공급'] = dfp.sum(axis=1)
-                # 3. (선택사항) '계약' 칼럼 기준 내림차순 정렬
-                if '공급' in dfp.columns:
-                    dfp = dfp.sort_values(by='공급', ascending=False)
-            
-                # 4. 비율(%) 계산 (합계 칼럼을 기준으로 계산)
-                original_cols = [c for c in dfp.columns if c != '공급'] # 합계 제외한 원래 칼럼들
-                for col in original_cols:
-                    dfp[f'{col}(%)'] = (dfp[col] / dfp['공급'] * 100).round(0).fillna(0)
-                # 3. 데이터프레임 정리 (인덱스 초기화)                
-                dfp = dfp[['공급','계약','미계약','계약(%)','미계약(%)']]
-                dfp = dfp.reset_index()
-                
-                
-                dfp2 = dff.pivot_table(
-                    index='상품', 
-                    columns='계약여부', 
-                    values='총분양금', 
-                    aggfunc='sum',
-                    fill_value=0)        
-                # 2. 백만 단위 변환 및 소수점 처리
-                # 모든 수치형 데이터를 1,000,000으로 나눕니다.
-                dfp2['공급'] = dfp2.sum(axis=1)
-                dfp2 = (dfp2/ 1_000_000).round(0) 
-                
-                if '공급' in dfp2.columns:
-                    dfp2 = dfp2.sort_values(by='공급', ascending=False)
-
-                original_cols2 = [c for c in dfp2.columns if c != '공급'] # 합계 제외한 원래 칼럼들
-                for col in original_cols2:
-                    dfp2[f'{col}(%)'] = (dfp2[col] / dfp2['공급'] * 100).round(0).fillna(0)
-                # 3. 데이터프레임 정리 (인덱스 초기화)                
-                dfp2 = dfp2[['공급','계약','미계약','계약(%)','미계약(%)']]
-                dfp2 = dfp2.reset_index()               
+            names = matching_projects(sales_cubes().index, pj)
+            if pj != ALL_PROJECTS and len(names) > 1:
+                st.caption(f"'{pj}'이(가) 들어간 사업 {len(names)}곳 합산: {', '.join(names)}")
+            cube = project_sales(pj)  # 아래 표들은 모두 이 집계에서 파생 (갱신 시 미리 계산)
+            combined = project_trend(pj)  # 상품별 월 누적 계약/완납률 (갱신 시 미리 계산)
+            ibju = cube['입주증'].sum()
+            lawsuit = cube.loc[cube['소송'] == '소송', '세대'].sum() #소송 개수
+            if not cube.empty:                
+                # 계약여부별 세대수 / 금액 (공급 대비 %)
+                dfp = share_table(cube, '계약여부', '세대', '공급', ['계약', '미계약'])
+                dfp2 = share_table(cube, '계약여부', '총분양금', '공급', ['계약', '미계약'])
         
                 #c1, c2 = st.columns([3, 1]) # %가 추가되었으므로 비율을 조금 조정
                 c1, c2 = st.columns(2) # %가 추가되었으므로 비율을 조금 조정
                 with c1:
                     st.write('동호기준')                                    
                     st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 세대(실), %)</div>', unsafe_allow_html=True)
-                    styled_df = dfp.style.apply(style_fill_col, axis=0)
-                    styled_df = styled_df.format({'계약(%)': '{:.0f}', '미계약(%)': '{:.0f}'})
+                    styled_df = style_table(dfp, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                     st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                     #st.dataframe(dfp, use_container_width=True, hide_index=True)
                     
@@ -1033,68 +2218,18 @@ elif menu == "분양":
                 with c2:
                     st.write('금액기준')                    
                     st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 백만원, %)</div>', unsafe_allow_html=True)                    
-                    styled_df = dfp2.style.apply(style_fill_col, axis=0)
-                    styled_df = styled_df.format({'공급': '{:,.0f}', '계약': '{:,.0f}', '미계약': '{:,.0f}',
-                                                  '계약(%)': '{:.0f}', '미계약(%)': '{:.0f}',
-                                                  })
+                    styled_df = style_table(dfp2, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                     st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                     #st.dataframe(dfp2.style.format(thousands=",", precision=0), use_container_width=True, hide_index=True)                
                 
-                # 1. 계약 데이터 정리
-                # 2. 계약 데이터 정리 (날짜 변환 및 dropna)
-                dffg = dff.groupby(['상품', '계약월'])['동호수'].count().reset_index(name='계약건수')
-                dffg['날짜'] = pd.to_datetime(dffg['계약월'], errors='coerce')
-                dffg = dffg.dropna(subset=['날짜']).sort_values(['상품', '날짜'])
-                dffg['누적계약'] = dffg.groupby('상품')['계약건수'].cumsum()
-                
-                # 3. 완납 데이터 정리 (ibju > 0 조건은 dff 필터링 단계에서 이미 ibju 합계로 확인 가능)
-                dff_paid = dff[dff['완납여부'] == '완납'].copy()
-                if not dff_paid.empty:
-                    dffg_paid = dff_paid.groupby(['상품', '완납월'])['동호수'].count().reset_index(name='완납건수')
-                    dffg_paid['날짜'] = pd.to_datetime(dffg_paid['완납월'], errors='coerce')
-                    dffg_paid = dffg_paid.dropna(subset=['날짜']).sort_values(['상품', '날짜'])
-                    dffg_paid['누적완납'] = dffg_paid.groupby('상품')['완납건수'].cumsum()
-                else:
-                    dffg_paid = pd.DataFrame(columns=['상품', '날짜', '누적완납'])
-            
-                # 4. 데이터 통합 및 정렬 (날짜순 정렬 필수)
-                combined = pd.merge(
-                    dffg[['상품', '날짜', '누적계약']], 
-                    dffg_paid[['상품', '날짜', '누적완납']], 
-                    on=['상품', '날짜'], 
-                    how='outer')
-                
-            
-                # 🌟 [핵심 수정] 정렬 순서를 '날짜' 우선으로 명확히 지정
-                # 날짜 기준으로 먼저 줄을 세워야 '날짜표시'를 만들었을 때 순서가 꼬이지 않습니다.
-                combined = combined.sort_values(by=['날짜', '상품']).reset_index(drop=True)
-                
-                # 5. 비율 계산 및 수치 보간
-                combined['누적계약'] = combined.groupby('상품')['누적계약'].ffill().fillna(0)
-                combined['누적완납'] = combined.groupby('상품')['누적완납'].ffill().fillna(0)
-                combined = pd.merge(combined, dff_total, on='상품', how='left')
-                
-                combined['계약률'] = combined['누적계약'] / combined['총공급']
-                combined['완납률'] = combined['누적완납'] / combined['총공급']
-                
-                sorted_date_labels = sorted(combined['날짜'].dropna().unique())
-                sorted_date_strings = [d.strftime('%Y-%m') for d in sorted_date_labels]
-                
-                combined['날짜표시'] = combined['날짜'].dt.strftime('%Y-%m')
-                
                 # --- 그래프 그리기 ---
                 st.markdown("#### 📈 상품별 월별 누적계약률")
                 if not combined.empty:
-                    fig1 = px.line(combined, x='날짜표시', y='계약률', color='상품', 
+                    fig1 = px.line(combined, x='월', y='계약률', color='상품', 
                                    markers=True, template="plotly_white")                   
                     
-                    # 🌟 [핵심 수정] X축의 순서를 강제로 정렬된 날짜 리스트로 고정합니다.
-                    fig1.update_xaxes(
-                        type='category', 
-                        categoryorder='array', 
-                        categoryarray=sorted_date_strings,
-                        title="계약월"
-                    )
+                    # 월 격자가 빠짐없이 채워져 있으므로 날짜축 그대로 사용
+                    fig1.update_xaxes(tickformat='%Y-%m', title="계약월")
                     fig1.update_yaxes(
                         tickformat=".0%", 
                         range=[0, 1.1],
@@ -1108,85 +2243,34 @@ elif menu == "분양":
                         yaxis=dict(tickformat=".0%", range=[0, 1.1])
                     )
                     st.plotly_chart(fig1, use_container_width=True)
+
+                if pj == ALL_PROJECTS:
+                    st.markdown("#### 📈 사업별 월별 누적계약률")
+                    by_project = portfolio_trend()
+                    if not by_project.empty:
+                        fig0 = px.line(by_project, x='월', y='계약률', color='사업명', template="plotly_white")
+                        fig0.update_xaxes(tickformat='%Y-%m', title="계약월")
+                        fig0.update_yaxes(tickformat=".0%", range=[0, 1.1], gridcolor='lightgray')
+                        st.plotly_chart(fig0, use_container_width=True)
                                 
                 #입주현황표시
                 if ibju > 0:
                     st.divider()               
                     st.subheader('📊 입주현황')                                        
-                    dfp3 = dff.pivot_table(
-                        index='상품',
-                        columns='완납여부', 
-                        values='동호수', 
-                        aggfunc='count',
-                        fill_value=0)        
-                    # [추가] 필수 컬럼('완납', '미납')이 없을 경우를 대비해 0으로 생성
-# =============================================================================
-#                     for col in ['완납', '미납']:
-#                         if col not in dfp3.columns:
-#                             dfp3[col] = 0
-# =============================================================================
-                
-                    # 2. 합계 및 정렬 (초기 공급량 기준 정렬)
-                    dfp3['공급'] = dfp3.sum(axis=1)
-                    dfp3 = dfp3.sort_values(by='공급', ascending=False)
-                
-                    # 3. 비율(%) 계산
-                    # '공급'을 제외한 원래의 컬럼들(완납, 미납)에 대해 루프
-                    # 만약 컬럼이 더 많아질 수 있다면 이 방식이 안전합니다.
-                    target_cols = [c for c in ['완납', '미납'] if c in dfp3.columns]
-                    for col in target_cols:
-                        dfp3[f'{col}(%)'] = (dfp3[col] / dfp3['공급'] * 100).round(0).fillna(0)
-                
-                    # 4. 데이터프레임 정리 및 인덱스 초기화
-                    dfp3 = dfp3.reset_index()
-                    
-                    # 5. 사용자 지정 순서 정렬
-                    custom_order = ['아파트', '오피스텔', '생활숙박시설','지식산업센터','판매시설', '상가']
-                    # 데이터에 존재하는 '상품'만 카테고리로 설정 (데이터 유실 방지)
-                    dfp3['상품'] = pd.Categorical(dfp3['상품'], categories=custom_order, ordered=True)
-                    
-                    # 6. 최종 컬럼 선택 및 정렬
-                    # 컬럼 존재 여부를 다시 확인하며 슬라이싱
-                    final_cols = ['상품', '공급', '완납', '미납', '완납(%)', '미납(%)']
-                    dfp3 = dfp3[final_cols].sort_values(by='상품')                
-                    
-                                        
-                    dfp4 = dff.pivot_table(
-                        index='상품', 
-                        columns='완납여부', 
-                        values='총분양금', 
-                        aggfunc='sum',
-                        fill_value=0)        
-                    # 2. 백만 단위 변환 및 소수점 처리
-                    # 모든 수치형 데이터를 1,000,000으로 나눕니다.
-                    dfp4['공급'] = dfp4.sum(axis=1)
-                    dfp4 = (dfp4/ 1_000_000).round(0) 
-                    
-                    if '공급' in dfp4.columns:
-                        dfp4 = dfp4.sort_values(by='공급', ascending=False)
-
-                    original_cols4 = [c for c in dfp4.columns if c != '공급'] # 합계 제외한 원래 칼럼들
-                    for col in original_cols4:
-                        dfp4[f'{col}(%)'] = (dfp4[col] / dfp4['공급'] * 100).round(0).fillna(0)
-                    # 3. 데이터프레임 정리 (인덱스 초기화)                
-                    dfp4 = dfp4[['공급','완납','미납','완납(%)','미납(%)']]
-                    dfp4 = dfp4.reset_index()
+                    dfp3 = share_table(cube, '완납여부', '세대', '공급', ['완납', '미납'], by_product=True)
+                    dfp4 = share_table(cube, '완납여부', '총분양금', '공급', ['완납', '미납'])
                     
                     c3, c4 = st.columns(2) # %가 추가되었으므로 비율을 조금 조정                    
                     with c3:
                         st.write('동호기준')                
                         st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 세대(실), %)</div>', unsafe_allow_html=True)
-                        styled_df = dfp3.style.apply(style_fill_col, axis=0)
-                        styled_df = styled_df.format({'완납(%)': '{:.0f}', '미납(%)': '{:.0f}'})
+                        styled_df = style_table(dfp3, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                         st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                         #st.dataframe(dfp3, use_container_width=True, hide_index=True) #hide_index를 하면 인덱스 숨김                    
                     with c4:                        
                         st.write('금액기준')                
                         st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 백만원, %)</div>', unsafe_allow_html=True)
-                        styled_df = dfp4.style.apply(style_fill_col, axis=0)
-                        styled_df = styled_df.format({'공급': '{:,.0f}', '완납': '{:,.0f}', '미납': '{:,.0f}',
-                                                      '완납(%)': '{:.0f}', '미납(%)': '{:.0f}',
-                                                      })
+                        styled_df = style_table(dfp4, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                         st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                         #st.dataframe(dfp4.style.format(thousands=",", precision=0), use_container_width=True, hide_index=True)                        
                     
@@ -1195,10 +2279,10 @@ elif menu == "분양":
                     paid_plot_df = combined[combined['누적완납'] > 0].copy()
                     
                     if not paid_plot_df.empty:
-                        fig2 = px.line(paid_plot_df, x='날짜표시', y='완납률', color='상품', 
+                        fig2 = px.line(paid_plot_df, x='월', y='완납률', color='상품', 
                                        markers=True, template="plotly_white",
                                        line_dash='상품') # 계약률과 구분하기 위해 선 스타일 차별화 가능
-                        fig2.update_layout(yaxis=dict(tickformat=".0%", range=[0, 1.1]), xaxis=dict(type='category', title="완납월"))
+                        fig2.update_layout(yaxis=dict(tickformat=".0%", range=[0, 1.1]), xaxis=dict(tickformat='%Y-%m', title="완납월"))
                         st.plotly_chart(fig2, use_container_width=True)
                     else:
                         st.info("입주증 발급 기록은 있으나, 매칭되는 월별 완납 데이터가 없습니다.")
@@ -1209,81 +2293,34 @@ elif menu == "분양":
                 if lawsuit > 0:
                     st.divider()
                     st.subheader('📊 소송현황')                                        
-                    dfp5 = dff.pivot_table(
-                        index='상품',
-                        columns='소송', 
-                        values='동호수', 
-                        aggfunc='count',
-                        fill_value=0)        
-                    # 2. 백만 단위 변환 및 소수점 처리
-                    # 모든 수치형 데이터를 1,000,000으로 나눕니다.
-                    dfp5['세대'] = dfp5.sum(axis=1)
-                    #dfp2 = (dfp2/ 1_000_000).round(0) 
-                    
-                    dfp5 = dfp5.sort_values(by='세대', ascending=False)
-
-                    original_cols5 = [c for c in dfp5.columns if c != '세대'] # 합계 제외한 원래 칼럼들
-                    for col in original_cols5:
-                        dfp5[f'{col}(%)'] = (dfp5[col] / dfp5['세대'] * 100).round(0).fillna(0)
-                    # 3. 데이터프레임 정리 (인덱스 초기화)                                    
-                    dfp5 = dfp5[['세대','소송','미소송','소송(%)','미소송(%)']]
-                    dfp5 = dfp5.reset_index()
-                    
-                    custom_order = ['아파트', '오피스텔', '생활숙박시설','지식산업센터','판매시설', '상가']                    
-                    # 해당 컬럼을 Categorical 타입으로 변환 (ordered=True가 핵심)
-                    dfp5['상품'] = pd.Categorical(dfp5['상품'], categories=custom_order, ordered=True)                    
-                    dfp5 = dfp5.sort_values(by='상품')                   
-                    
-                    dfp6 = dff.pivot_table(
-                        index='상품', 
-                        columns='소송', 
-                        values='총분양금', 
-                        aggfunc='sum',
-                        fill_value=0)        
-                    # 2. 백만 단위 변환 및 소수점 처리
-                    # 모든 수치형 데이터를 1,000,000으로 나눕니다.
-                    dfp6['세대'] = dfp6.sum(axis=1)
-                    dfp6 = (dfp6/ 1_000_000).round(0) 
-                    
-                    if '세대' in dfp6.columns:
-                        dfp6 = dfp6.sort_values(by='세대', ascending=False)
-
-                    original_cols6 = [c for c in dfp6.columns if c != '세대'] # 합계 제외한 원래 칼럼들
-                    for col in original_cols6:
-                        dfp6[f'{col}(%)'] = (dfp6[col] / dfp6['세대'] * 100).round(0).fillna(0)
-                    # 3. 데이터프레임 정리 (인덱스 초기화)                
-                    dfp6 = dfp6[['세대','소송','미소송','소송(%)','미소송(%)']]
-                    dfp6 = dfp6.reset_index()
+                    dfp5 = share_table(cube, '소송', '세대', '세대', ['소송', '미소송'], by_product=True)
+                    dfp6 = share_table(cube, '소송', '총분양금', '세대', ['소송', '미소송'])
                     
                     c5, c6 = st.columns(2) # %가 추가되었으므로 비율을 조금 조정                    
                     with c5:
                         st.write('동호기준')                                        
                         st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 세대(실), %)</div>', unsafe_allow_html=True)
-                        styled_df = dfp5.style.apply(style_fill_col, axis=0)
-                        styled_df = styled_df.format({'소송(%)': '{:.0f}', '미소송(%)': '{:.0f}'})
+                        styled_df = style_table(dfp5, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                         st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                         #st.dataframe(dfp5, use_container_width=True, hide_index=True) #hide_index를 하면 인덱스 숨김                
                     with c6:                        
                         st.write('금액기준')                
                         st.markdown('<div style="text-align: right; font-size: 12px;">(단위 : 백만원, %)</div>', unsafe_allow_html=True)
-                        styled_df = dfp6.style.apply(style_fill_col, axis=0)
-                        styled_df = styled_df.format({'세대': '{:,.0f}', '소송': '{:,.0f}', '미소송': '{:,.0f}',
-                                                      '소송(%)': '{:.0f}', '미소송(%)': '{:.0f}',
-                                                      })
+                        styled_df = style_table(dfp6, [RATE_COLS])  # 비율 컬럼 노란색, 숫자는 콤마
                         st.dataframe(styled_df, use_container_width=True, hide_index=True)                    
                         #st.dataframe(dfp6.style.format(thousands=",", precision=0), use_container_width=True, hide_index=True)
                     
                     
                     st.divider()
                     st.subheader('📊 전체현황')                                        
-                    dff_final = dff.groupby(['상품', '소송','완납여부', '계약여부2']).agg({
-                        '동호수': 'count',
-                        '총분양금': 'sum'
-                        }).reset_index()
+                    dff_final = cube.groupby(['상품', '소송','완납여부', '계약여부2']).agg(
+                        동호수=('세대', 'sum'),
+                        총분양금=('총분양금', 'sum')
+                        ).reset_index()
                     
                     dff_final['총분양금'] = (dff_final['총분양금'] / 1_000_000).round(0) 
                     # 해당 컬럼을 Categorical 타입으로 변환 (ordered=True가 핵심)
-                    dff_final['상품'] = pd.Categorical(dff_final['상품'], categories=custom_order, ordered=True)                    
+                    dff_final['상품'] = pd.Categorical(dff_final['상품'], categories=PRODUCT_ORDER, ordered=True)                    
                     # '상품'은 오름차순(True), '완납여부'와 '소송'은 내림차순(False)
                     dff_final = dff_final.sort_values(
                         by=['상품', '완납여부', '소송'], 
@@ -1302,208 +2339,61 @@ elif menu == '실적조회':
 #     data = conn.read(spreadsheet=url)      
 #     df_raw = pd.DataFrame(data)
 # =============================================================================
-    df_raw = alv_data()
-    
-    # 숫자형 변환 (중요: 문자열로 섞여 있으면 연산 안됨)
-    df_raw['값'] = pd.to_numeric(df_raw['값'], errors='coerce').fillna(0)
+    wide = alv_wide()  # 가로형 캐시, 항목별 내역은 조회 시 해당 기준월/사업 행만 세로형으로 펼침
+    show_as_of('alv')  # '값'은 적재 시점에 숫자로 변환되어 있음
 
     col1, col2, col3 = st.columns([3,3,3])
     #with col1: pj = st.text_input('사업명 입력')
     with col1:
-        pj = st.selectbox('(본공사)사업명 선택', sorted(df_raw['프로젝트 내역'].unique()))
-        url_pair = 'https://docs.google.com/spreadsheets/d/1uoL2CDVEi_KPV74eT5VEOjVB7ucCrEYnl9TkNQvstsM/edit?gid=1549480112#gid=1549480112'
-        data1 = conn.read(spreadsheet=url_pair)      
-        df1 = pd.DataFrame(data1)
-        pj2 = next(iter(df1.loc[df1['pj'] == pj, 'pjo']), None)
+        pj = st.selectbox('(본공사)사업명 선택', sorted(wide.index.unique('프로젝트 내역')))
+        # 옵션공사를 골라도 본공사 기준으로 묶어서 조회 (쌍 인덱스는 pj_pair 갱신 시에만 다시 만듦)
+        pj = main_project(pj)
+        options = option_projects(pj)
         
     
-    with col2: dday = st.selectbox('기준월 선택', sorted(df_raw['기준월'].unique(), reverse=True))               
+    with col2: dday = st.selectbox('기준월 선택', sorted(wide.index.unique('기준월'), reverse=True))               
     with col3:     
         st.markdown('<p style="margin-bottom: 28px;"></p>', unsafe_allow_html=True)
         sch_button = st.button('조회')
         
     if sch_button:
-        all_dfs = []
+        # 본공사/옵션공사 손익 행렬 (기준월, 사업별 캐시). 합계는 모든 행렬에서 바로 계산
+        main = pnl_matrix(dday, pj)
+        opts = [(pjo, pnl_matrix(dday, pjo)) for pjo in options]
         with col1:
-            st.write("본공사")
-            cond = (df_raw['기준월'] == dday)
-            if pj:
-                cond &= df_raw['프로젝트 내역'].str.contains(pj, na=False, case=False)        
-        
-            dff = df_raw[cond].copy()
-    
-            if dff.empty:
-                st.warning("조회된 데이터가 없습니다.")
+            st.write(f"본공사 ({pj})")
+            if main.empty:
+                st.warning(f"{dday} '{pj}'와 일치하는 프로젝트 내역이 없습니다. (대소문자·앞뒤 공백 무시, 부분 일치 아님)")
             else:
-                idx_cols = ['프로젝트', '프로젝트 내역', '기준월', '기간기준']
-                
-                # 1. 헬퍼 함수들
-                def get_series(df, category):
-                    return df[df['항목기준'] == category].groupby(idx_cols)['값'].sum()
-    
-                def create_row(series, name):
-                    # 연산 결과(Series)를 DataFrame으로 변환하고 컬럼명을 '값'으로 지정
-                    res = series.to_frame(name='값').reset_index()
-                    res['항목기준'] = name
-                    return res
-    
-                # 2. 항목별 Series 추출
-                s_sales = get_series(dff, '매출')
-                s_cost = get_series(dff, '매원')
-                s_sg_a = get_series(dff, '판관비')
-                s_oth_i = get_series(dff, '기타영업수익')
-                s_oth_e = get_series(dff, '기타영업비용')
-                s_int_i = get_series(dff, '이자수익')
-                s_int_e = get_series(dff, '이자비용')
-                s_fin = get_series(dff, '금융비')
-    
-                # 3. 산식 계산 (fill_value=0 필수)
-                gp_val = s_sales.sub(s_cost, fill_value=0) # 매출이익
-                op_val = gp_val.sub(s_sg_a, fill_value=0)  # 영업이익
-                ord_val = (op_val.add(s_oth_i, fill_value=0)
-                                 .sub(s_oth_e, fill_value=0)
-                                 .add(s_int_i, fill_value=0)
-                                 .sub(s_int_e, fill_value=0)
-                                 .sub(s_fin, fill_value=0)) # 경상이익
-                
-                cost_ratio_val = (s_cost.div(s_sales.replace(0, np.nan), fill_value=0).fillna(0) * 100)  
-                cost_ratio_df = create_row(cost_ratio_val, '원가율')
-                gp_df = create_row(gp_val, '매출이익')
-                op_df = create_row(op_val, '영업이익')
-                ord_df = create_row(ord_val, '경상이익')
-    
-                # 기존 dff와 계산된 지표들 병합                
-                dffc = pd.concat([dff, gp_df, op_df, ord_df, cost_ratio_df], ignore_index=True)    
-                # 6. 정렬 및 피벗
-                corder = ['매출', '토지비', '공사비', '경비', '공손충', '하자보수비', '매원','원가율', '매출이익',
-                          '판관비', '영업이익', '기타영업수익', '기타영업비용', '금융비', '이자수익', '이자비용', '경상이익']                
-                dffc['항목기준'] = pd.Categorical(dffc['항목기준'], categories=corder, ordered=True)
-                
-                # 기간기준 정렬 순서 정의
-                period_order = ['당월', '금년', '누계']                
-                # 기간기준 컬럼을 카테고리형으로 변환 (순서 고정)
-                dffc['기간기준'] = pd.Categorical(dffc['기간기준'], categories=period_order, ordered=True)                
-                               
-                
-                dffc_main = dffc.copy() # 본공사 결과 저장
-                all_dfs.append(dffc_main)
-                
-                # 피벗 테이블 생성 (이제 행과 열 모두 지정한 순서대로 정렬됩니다)                
-                dffp_main = dffc_main.pivot_table(index=['프로젝트', '항목기준'], columns='기간기준', values='값', aggfunc='sum')
-                styled_main = dffp_main.style.apply(style_fill_row, axis=1).format("{:,.0f}")
-                st.dataframe(styled_main, use_container_width=True, height=630)
+                st.dataframe(style_table(pnl_table(main), [ROW_HIGHLIGHT]), use_container_width=True, height=630)
                              
         with col2:
-            if pj2:
-                st.write("옵션공사")
-                cond = (df_raw['기준월'] == dday)            
-                cond &= df_raw['프로젝트 내역'].str.contains(pj2, na=False, case=False)        
-        
-                dff = df_raw[cond].copy()
-    
-                if dff.empty:
-                    st.warning("조회된 데이터가 없습니다.")
+            for pjo, opt in opts:
+                st.write(f"옵션공사 ({pjo})")
+                if opt.empty:
+                    st.warning(f"{dday} '{pjo}'와 일치하는 프로젝트 내역이 없습니다. (대소문자·앞뒤 공백 무시, 부분 일치 아님)")
                 else:
-                    idx_cols = ['프로젝트', '프로젝트 내역', '기준월', '기간기준']
-                    
-                    # 1. 헬퍼 함수들
-                    def get_series(df, category):
-                        return df[df['항목기준'] == category].groupby(idx_cols)['값'].sum()
-        
-                    def create_row(series, name):
-                        # 연산 결과(Series)를 DataFrame으로 변환하고 컬럼명을 '값'으로 지정
-                        res = series.to_frame(name='값').reset_index()
-                        res['항목기준'] = name
-                        return res
-        
-                    # 2. 항목별 Series 추출
-                    s_sales = get_series(dff, '매출')
-                    s_cost = get_series(dff, '매원')
-                    s_sg_a = get_series(dff, '판관비')
-                    s_oth_i = get_series(dff, '기타영업수익')
-                    s_oth_e = get_series(dff, '기타영업비용')
-                    s_int_i = get_series(dff, '이자수익')
-                    s_int_e = get_series(dff, '이자비용')
-                    s_fin = get_series(dff, '금융비')
-        
-                    # 3. 산식 계산 (fill_value=0 필수)
-                    gp_val = s_sales.sub(s_cost, fill_value=0) # 매출이익
-                    op_val = gp_val.sub(s_sg_a, fill_value=0)  # 영업이익
-                    ord_val = (op_val.add(s_oth_i, fill_value=0)
-                                     .sub(s_oth_e, fill_value=0)
-                                     .add(s_int_i, fill_value=0)
-                                     .sub(s_int_e, fill_value=0)
-                                     .sub(s_fin, fill_value=0)) # 경상이익
-        
-                    # 4. 새로운 행 데이터 생성
-                    cost_ratio_val = (s_cost.div(s_sales.replace(0, np.nan), fill_value=0).fillna(0) * 100)  
-                    cost_ratio_df = create_row(cost_ratio_val, '원가율')
-                    gp_df = create_row(gp_val, '매출이익')
-                    op_df = create_row(op_val, '영업이익')
-                    ord_df = create_row(ord_val, '경상이익')
-        
-                    # 5. 기존 dff와 계산된 지표들 병합                    
-                    dffc = pd.concat([dff, gp_df, op_df, ord_df, cost_ratio_df], ignore_index=True)
-        
-                    # 6. 정렬 및 피벗
-                    corder = ['매출', '토지비', '공사비', '경비', '공손충', '하자보수비', '매원', '원가율','매출이익',
-                              '판관비', '영업이익', '기타영업수익', '기타영업비용', '금융비', '이자수익', '이자비용', '경상이익']                    
-                    dffc['항목기준'] = pd.Categorical(dffc['항목기준'], categories=corder, ordered=True)
-                    
-                    # 1. 기간기준 정렬 순서 정의
-                    period_order = ['당월', '금년', '누계']                    
-                    # 2. 기간기준 컬럼을 카테고리형으로 변환 (순서 고정)
-                    dffc['기간기준'] = pd.Categorical(dffc['기간기준'], categories=period_order, ordered=True)
-                                        
-                    
-                    dffc_opt = dffc.copy() # 옵션공사 결과 저장
-                    all_dfs.append(dffc_opt)
-                    
-                    # 옵션공사 테이블 출력 (기존 코드 유지)
-                    dffp_opt = dffc_opt.pivot_table(index=['프로젝트', '항목기준'], columns='기간기준', values='값', aggfunc='sum')
-                    styled_opt = dffp_opt.style.apply(style_fill_row, axis=1).format("{:,.0f}")
-                    st.dataframe(styled_opt, use_container_width=True, height=630)
-                    
-# =============================================================================
-#                     # 4. 피벗 테이블 생성 (이제 행과 열 모두 지정한 순서대로 정렬됩니다)
-#                     dffp = dffc.pivot_table(index=['프로젝트', '항목기준'], columns='기간기준', values='값', aggfunc='sum')                    
-#                     # .format("{:,.0f}")을 함께 써주면 천 단위 콤마와 배경색을 동시에 적용할 수 있습니다.
-#                     styled_dffp = dffp.style.apply(style_fill_row, axis=1).format("{:,.0f}")                
-#                     # 3. Streamlit에 출력
-#                     st.dataframe(styled_dffp, use_container_width=True, height=600)
-# =============================================================================
+                    st.dataframe(style_table(pnl_table(opt), [ROW_HIGHLIGHT]), use_container_width=True, height=630)
             
         with col3:
-            if pj2:
+            if opts:
                 st.write("본공사+옵션공사 합계")                
-                # 1. 모든 데이터를 하나로 합침
-                total_df = pd.concat(all_dfs, ignore_index=True)                
-                # 2. '프로젝트'명을 '합계'로 통일 (피벗 시 행을 하나로 합치기 위함)
-                total_df['프로젝트'] = '합계'
-                
-                # 3. 정렬 순서 재지정 (concat 후 카테고리 속성이 풀릴 수 있으므로 다시 설정)
-                total_df['항목기준'] = pd.Categorical(total_df['항목기준'], categories=corder, ordered=True)
-                total_df['기간기준'] = pd.Categorical(total_df['기간기준'], categories=period_order, ordered=True)              
-                                
-                # 4. 피벗 테이블 생성
-                dffp_total = total_df.pivot_table(index=['프로젝트', '항목기준'], columns='기간기준', values='값', aggfunc='sum')                
-                
-                try:
-                    # 피벗 테이블에서 매출과 매원 행 추출 (인덱스 구조에 주의)
-                    # dffp_total.loc[('합계', '항목명')] 형태로 접근
-                    total_sales = dffp_total.loc[('합계', '매출')]
-                    total_cost = dffp_total.loc[('합계', '매원')]            
-                    # 총 매원 / 총 매출 (매출이 0인 경우 대비)
-                    total_ratio = (total_cost / total_sales.replace(0, np.nan)).fillna(0) * 100                    
-                    # 피벗 테이블의 '원가율' 행 업데이트
-                    dffp_total.loc[('합계', '원가율'), :] = total_ratio
-                except KeyError:
-                    # 데이터에 매출이나 매원이 없는 경우 대비
-                    pass
-                
-                # 5. 스타일 적용 및 출력
-                styled_total = dffp_total.style.apply(style_fill_row, axis=1).format("{:,.0f}")
-                st.dataframe(styled_total, use_container_width=True, height=630)        
+                total = pnl_total([main] + [opt for _, opt in opts])
+                if not total.empty:
+                    st.dataframe(style_table(pnl_table(total), [ROW_HIGHLIGHT]), use_container_width=True, height=630)        
+
+        with st.expander(f'🔎 항목별 내역 ({dday})'):
+            detail = alv_long(dday, [pj] + options)
+            st.dataframe(detail[detail['값'] != 0], use_container_width=True, hide_index=True)
+
+    # 전 사업 손익 순위 (손익 cube에서 기준월/기간만 잘라 정렬, 표 머리글 클릭으로 재정렬 가능)
+    # 체크했을 때만 계산 (expander는 닫혀 있어도 안의 코드가 매 rerun마다 실행됨)
+    if st.checkbox(f'📋 전체 사업 손익 순위 ({dday}, 원가율 높은 순)'):
+        period = st.radio('기간기준', ALV_PERIODS, index=2, horizontal=True)
+        ranking = pnl_ranking(dday, period)
+        config = {col: st.column_config.NumberColumn(format="%d") for col in PNL_RANK_COLS}
+        config['원가율'] = st.column_config.NumberColumn(format="%.1f")
+        st.dataframe(ranking, use_container_width=True, hide_index=True, column_config=config)
 
 
                 
@@ -1586,8 +2476,8 @@ elif menu == "실거래조회":
             query += " AND 전용면적 >= :ex_min AND 전용면적 <= :ex_max LIMIT 5000"
 
             with st.spinner('테이블 조회 중...'):
-                with engine.connect() as conn:
-                    df = pd.read_sql(text(query), conn, params=params)
+                with engine.connect() as db_conn:
+                    df = pd.read_sql(text(query), db_conn, params=params)
             
             # 데이터 정제 및 세션 저장
             if not df.empty:
@@ -1632,14 +2522,10 @@ elif menu == "실거래조회":
 
 elif menu == "입주예정":
     st.subheader('🏠 아파트 입주예정(부동산지인)')
-    url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=1029648553#gid=1029648553"
-    ddf = conn.read(spreadsheet=url)        
-    num_col = ['세대수','기준년']
-    for col in num_col:
-        if col in ddf.columns:
-            ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)    
+    ddf = load_sheet('입주예정')
+    show_as_of('입주예정')
     #df = df[df['기준년'] > 2025]
-    ddf.loc[ddf['시도'] == '강원특별자치도', '시도'] = '강원도'        
+    # '강원특별자치도' → '강원도' 표준화는 적재 시점(SCHEMAS['입주예정'])에 처리
     dff = ddf[ddf['구분']=='아파트']    
     #chart는 인덱스를 그대로 쓰고, px는 reset_index()를 해서 x값으로 쓴다.
     dfp = dff.pivot_table(index='기준년', values='세대수', aggfunc='sum', fill_value=0).reset_index()    
@@ -1687,15 +2573,8 @@ elif menu == "입주예정":
 
 elif menu == "인구":
         st.subheader('🏠 주민등록인구')
-        url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=1726816395#gid=1726816395"    
-        ddf = conn.read(spreadsheet=url)
-        ddf = ddf.drop("행정기관코드", axis=1)
-        ncols = ['총인구수', '세대수', '남자 인구수', '여자 인구수']                    
-        for col in ncols:
-            if col in ddf.columns:
-                ddf[col] = pd.to_numeric(ddf[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)            
-                # 비율 등이 아닌 일반 수치라면 정수(int)로 강제 변환
-                ddf[col] = ddf[col].astype(int)
+        ddf = load_sheet('인구')  # 행정기관코드 컬럼은 적재 시 제외됨
+        show_as_of('인구')
                 
         col1, col2 = st.columns(2)
         with col1:
@@ -1711,9 +2590,9 @@ elif menu == "인구":
             dff = ddf[cond]
             format_dict = {}
             for col in dff.columns:
-                if dff[col].dtype == 'int64':
+                if pd.api.types.is_integer_dtype(dff[col]):
                     format_dict[col] = '{:,.0f}'  # 정수는 천단위 콤마만
-                elif dff[col].dtype == 'float64':
+                elif pd.api.types.is_float_dtype(dff[col]):
                     format_dict[col] = '{:,.1f}'  # 실수는 천단위 콤마 + 소수점 1자리
             
             st.dataframe(dff.style.format(format_dict), use_container_width=True, hide_index=True, height=500)
@@ -1721,9 +2600,8 @@ elif menu == "인구":
         
 elif menu == "미분양":
     st.subheader('🏠 전국 미분양 추이')
-    url = "https://docs.google.com/spreadsheets/d/1j4lp5-8MJWr0ZgFevDs3Bv3O_rv9dJvQQUt7ew6Yt3A/edit?gid=667956721#gid=667956721"    
-    data = conn.read(spreadsheet=url)
-    data = data.drop(["항목","단위"], axis=1)
+    data = load_sheet('미분양')  # 항목, 단위 컬럼은 적재 시 제외됨
+    show_as_of('미분양')
     
     data_sido = data[data['시군구']=='계']    
     # axis=0은 세로 방향(컬럼별) 합계를 의미합니다.
@@ -1771,7 +2649,6 @@ elif menu == "미분양":
             
             if not dff.empty:
                 st.write(f"📊 {region} 지역 미분양 현황 [{dday}기준]")                                
-                dff[dday] = pd.to_numeric(dff[dday], errors='coerce').fillna(0)                        
                 dff = dff.sort_values(by=dday, ascending=False)                
                 # [핵심] subset을 사용하여 dday 컬럼에만 포맷 적용
                 styled_dff = dff.style.format("{:,.0f}", subset=[dday])                
@@ -1834,8 +2711,8 @@ elif menu == "청약홈조회":
 
 elif menu == "소송":
     st.subheader('📊 소송현황 조회')
-    url = "https://docs.google.com/spreadsheets/d/1diNe5cD5pFtz9ca7c4z5leUsbUTPgAPMM7fFmjFOczQ/edit?gid=1053819147#gid=1053819147"
-    ddf = conn.read(spreadsheet=url)
+    ddf = load_sheet('소송')
+    show_as_of('소송')
 # =============================================================================
 #     ncols = ['약정','기표','상환','잔액']  #숫자칼럼 명시
 #     for col in ncols:
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# 앱 모듈은 임포트 시점에 화면을 그리므로, 함수/클래스/상수 정의만 골라 실행해 테스트한다.
+import ast
+import functools
+import os
+import types
+
+import pytest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'streamlit_gsheet_test_rev4.py')
+
+
+class FakeStreamlit(types.SimpleNamespace):
+    """st.cache_resource 등 정의 시점에 쓰이는 데코레이터만 흉내 낸다"""
+
+    def cache_resource(self, func=None, **kwargs):
+        if func is None:
+            return self.cache_resource
+        memo = {}
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if args not in memo:
+                memo[args] = func(*args)
+            return memo[args]
+        wrapper.clear = memo.clear
+        return wrapper
+
+    cache_data = cache_resource
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def load_app(tmp_path):
+    tree = ast.parse(open(APP, encoding='utf-8').read())
+    ns = {'st': FakeStreamlit(), 'current_dir': str(tmp_path)}
+    for node in tree.body:
+        constant = isinstance(node, ast.Assign) and all(isinstance(t, ast.Name) and t.id.isupper() for t in node.targets)
+        if not (constant or isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef))):
+            continue
+        if isinstance(node, ast.Import) and any(alias.asname == 'st' for alias in node.names):
+            continue  # 캐시 데코레이터가 가짜 st를 쓰도록
+        try:
+            exec(compile(ast.Module(body=[node], type_ignores=[]), APP, 'exec'), ns)
+        except ImportError:  # streamlit, gspread 등 배포 환경 전용 패키지
+            pass
+    return ns
+
+
+@pytest.fixture
+def app(tmp_path):
+    return load_app(tmp_path)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+
+class InlineExecutor:
+    """백그라운드 갱신을 submit 시점에 바로 실행 (결과 확인용)"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def cache(app):
+    app['get_prefetch_executor'] = InlineExecutor
+    return app['get_sheet_cache']()
+
+
+def alv_sheet(amount):
+    """프로젝트 하나, 기준월 하나짜리 alv 원본 (당월매출만 값이 있음)"""
+    return pd.DataFrame({'프로젝트': ['P'], '프로젝트 내역': ['P 본공사'], '기준월': ['2025-01'], '당월매출': [amount]})
+
+
+def test_sheet_refresh_expires_whole_pnl_chain(app, cache):
+    # alv(가로형) -> 손익_cube -> 손익|월|pj 세 단계 모두 시트 갱신을 따라가야 한다
+    cache.put('alv', app['build_alv_wide'](alv_sheet(100)), app['SHEETS']['alv']['ttl'])
+    assert app['pnl_matrix']('2025-01', 'P 본공사').loc[('P', '당월'), '매출'] == 100
+
+    cache.put('alv', app['build_alv_wide'](alv_sheet(250)), app['SHEETS']['alv']['ttl'])
+    # 만료된 행렬은 그대로 보여주고(갱신 중 표시) 뒤에서 다시 만든다
+    assert app['pnl_matrix']('2025-01', 'P 본공사').loc[('P', '당월'), '매출'] == 100
+    assert app['pnl_matrix']('2025-01', 'P 본공사').loc[('P', '당월'), '매출'] == 250
+    assert not any(cache.info(name)['stale'] for name in ['alv_items', '손익_cube', '손익|2025-01|P 본공사'])
+
+
+def test_invalidate_drops_grandchildren(app, cache):
+    cache.put('alv', app['build_alv_wide'](alv_sheet(100)), app['SHEETS']['alv']['ttl'])
+    app['pnl_matrix']('2025-01', 'P 본공사')
+
+    cache.invalidate('alv')
+    for name in ['alv', 'alv_items', '손익_cube', '손익|2025-01|P 본공사']:
+        assert cache.lookup(name)[0] is None
+
+
+def test_stale_derived_entry_is_rebuilt_off_the_request(app, cache):
+    submitted = []
+    app['get_prefetch_executor'] = lambda: type('Recorder', (), {'submit': lambda self, *args: submitted.append(args)})()
+    cache.put('raw', pd.DataFrame({'v': [1]}), 60)
+    child = lambda: app['cached_frame']('child', lambda: app['cached_frame']('raw', None, 60) * 10, 60, source='raw')
+    assert child()['v'][0] == 10
+
+    cache.put('raw', pd.DataFrame({'v': [2]}), 60)
+    assert child()['v'][0] == 10  # 요청 스레드에서는 다시 만들지 않음
+    assert [args[1] for args in submitted] == ['child']  # (rebuild_frame, 'child', ...)
+
+
+def test_rebuild_from_a_source_changed_midway_stays_stale(app, cache):
+    cache.put('raw', pd.DataFrame({'v': [1]}), 60)
+
+    def build():
+        df = app['cached_frame']('raw', None, 60) * 10
+        cache.put('raw', pd.DataFrame({'v': [2]}), 60)  # 만드는 동안 다른 스레드가 원본을 갱신
+        return df
+
+    df, _ = app['rebuild_frame']('child', build, 60, source='raw')
+    assert df['v'][0] == 10
+    assert cache.info('child')['stale']
+
+
+def test_rebuild_from_an_intermediate_expired_midway_stays_stale(app, cache):
+    # raw -> mid -> child: raw가 갱신되면 mid는 버전은 그대로인 채 만료만 된다
+    cache.put('raw', pd.DataFrame({'v': [1]}), 60)
+    cache.put('mid', pd.DataFrame({'v': [1]}), 60, source='raw')
+
+    def build():
+        df = app['cached_frame']('mid', None, 60, source='raw') * 10
+        cache.put('raw', pd.DataFrame({'v': [2]}), 60)
+        return df
+
+    app['rebuild_frame']('child', build, 60, source='mid')
+    assert cache.info('child')['stale']
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from test_schema import refresh
+
+
+@pytest.fixture
+def cash(app):
+    """A는 1월·3월, B는 2월·3월에만 전망을 올린 자금수지"""
+    rows = [('A', '2025-01', '분양수입', '2025-04', 100), ('A', '2025-01', '공사비지출', '2025-04', 40),
+            ('A', '2025-03', '분양수입', '2025-04', 130), ('A', '2025-03', '분양수입', '2025-05', 20),
+            ('B', '2025-02', '분양수입', '2025-04', 50), ('B', '2025-03', '분양수입', '2025-04', 70)]
+    raw = pd.DataFrame(rows, columns=['사업명', '기준월', '구분', '집행월', '금액']).astype(str).assign(수지구분='영업수지')
+    app['get_sheet_cache']().put('자금수지', refresh(app, '자금수지', raw), 60)
+    return app
+
+
+def test_previous_plan_is_per_project(cash):
+    assert cash['previous_plan']('A', '2025-03') == '2025-01'  # 전체 기준월 목록의 2월이 아님
+    assert cash['previous_plan']('B', '2025-03') == '2025-02'
+    assert cash['previous_plan']('A', '2025-01') is None
+    assert cash['previous_plan']('C', '2025-03') is None
+
+
+def test_change_is_against_the_same_projects_previous_plan(cash):
+    change = cash['cash_table']('A', '2025-03', '2025-01-01', '변동')
+    assert change.loc['분양수입', ['2025-04', '2025-05', '총합계']].tolist() == [30, 20, 50]
+    assert change.loc['공사비지출', '2025-04'] == -40  # 전월에만 있던 셀
+    assert change.loc['누계과부족', '총합계'] == 150  # 5월은 이번 전망에만 있음
+    assert cash['cash_table']('B', '2025-03', '2025-01-01', '변동').loc['분양수입', '2025-04'] == 20
+
+
+def test_first_plan_has_no_change_table(cash):
+    assert cash['cash_table']('A', '2025-01', '2025-01-01', '변동').empty
+    assert not cash['cash_table']('A', '2025-01', '2025-01-01').empty
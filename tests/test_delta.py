@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+
+def upper(rows):
+    """변경 행에만 적용되는 적재 가공 (호출된 행 수 확인용)"""
+    upper.calls.append(len(rows))
+    return rows.assign(v=rows['v'].str.upper())
+
+
+def test_first_sync_transforms_every_row(app):
+    upper.calls = []
+    raw = pd.DataFrame({'k': [1, 2, 3], 'v': ['a', 'b', 'c']})
+    df, stats = app['merge_delta'](None, raw, upper)
+    assert df['v'].tolist() == ['A', 'B', 'C']
+    assert upper.calls == [3]
+    assert stats == {'전체': 3, '변경': 3, '삭제': 0}
+
+
+def test_only_changed_rows_are_transformed_and_order_follows_sheet(app):
+    upper.calls = []
+    base, _ = app['merge_delta'](None, pd.DataFrame({'k': [1, 2, 3], 'v': ['a', 'b', 'c']}), upper)
+    raw = pd.DataFrame({'k': [3, 4, 1], 'v': ['c', 'd', 'x']})  # 2 삭제, 4 추가, 1 변경, 순서 변경
+    upper.calls = []
+    df, stats = app['merge_delta'](base, raw, upper)
+    assert df[['k', 'v']].values.tolist() == [[3, 'C'], [4, 'D'], [1, 'X']]
+    assert upper.calls == [2]
+    assert stats == {'전체': 3, '변경': 2, '삭제': 2}
+
+
+def test_duplicate_rows_are_kept_separately(app):
+    raw = pd.DataFrame({'k': [1, 1], 'v': ['a', 'a']})
+    base, _ = app['merge_delta'](None, raw)
+    df, stats = app['merge_delta'](base, pd.DataFrame({'k': [1], 'v': ['a']}))
+    assert len(df) == 1
+    assert stats == {'전체': 1, '변경': 0, '삭제': 1}
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+SITE = '동호약정_벤처밸리'
+
+
+def load_site(app, amounts):
+    """101동 두 세대의 계약금/1차 약정 + 소계/합계 행. amounts는 (약정금액, 납부원금) 문자열 4쌍"""
+    rows = [('101', '101', '아파트/일반', '84A', '2024-01-10', '계약금', *amounts[0]),
+            ('101', '101', '아파트/일반', '84A', '2024-03-10', '1차 중도금', *amounts[1]),
+            ('101', '102', '아파트/일반', '84A', '2024-01-10', '계약금', *amounts[2]),
+            ('101', '102', '아파트/일반', '84A', '2024-03-10', '1차 중도금', *amounts[3]),
+            ('101', '', '', '소계', '2024-03-10', '', '999,999,999', '999,999,999'),
+            ('합계', '', '', '', '2024-03-10', '', '999,999,999', '999,999,999')]
+    raw = pd.DataFrame(rows, columns=app['DONGHO_COLS'])
+    app['fetch_sheets'] = lambda names: {n: raw for n in names}
+    app['get_sheet_cache']().put(SITE, app['refresh_snapshots']([SITE])[SITE][0].drop(columns=app['ROW_HASH']), 60)
+
+
+def test_integer_amounts_sum_exactly_without_subtotal_rows(app):
+    load_site(app, [('50,000,000', '50,000,000'), ('60,000,000', '60,000,000'),
+                    ('50,000,000', '50,000,000'), ('60,000,000', '0')])
+    base = app['dongho_base'](SITE)
+    assert base['약정금액'].dtype == 'int64' and base['약정금액'].sum() == 220_000_000
+    assert base['납부원금'].sum() == 160_000_000
+    monthly = app['dongho_monthly'](SITE).set_index(['상품', '구분'])
+    assert monthly.loc[('아파트', '납부원금'), '2024-03'] == 60
+    midpay = app['dongho_midpay'](SITE).set_index('상품')['납부원금']
+    assert midpay['합계'] == 60
+
+
+def test_fractional_amounts_are_not_truncated(app):
+    load_site(app, [('1,000.5', '1,000.5'), ('2,000.25', '0'), ('1,000.5', '1,000.5'), ('2,000.25', '0')])
+    base = app['dongho_base'](SITE)
+    assert base['약정금액'].dtype == 'float64'
+    assert base['약정금액'].sum() == 6001.5
+    assert base['납부원금'].sum() == 2001.0
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import types
+
+import pandas as pd
+import pytest
+
+
+class GSpreadException(Exception):
+    pass
+
+
+@pytest.fixture
+def fetch(app):
+    # 배포 환경 전용 패키지(gspread, requests, google-auth)의 예외형만 흉내 낸다
+    app['gspread'] = types.SimpleNamespace(exceptions=types.SimpleNamespace(GSpreadException=GSpreadException))
+    app['rq'] = types.SimpleNamespace(RequestException=IOError)
+    app['GoogleAuthError'] = type('GoogleAuthError', (Exception,), {})
+    app['fetch_sheet'] = lambda name: pd.DataFrame({'tab': [name]})
+    return app
+
+
+def test_batch_failure_is_recorded_and_falls_back_per_tab(fetch):
+    def fail(key, names):
+        raise GSpreadException('quota exceeded')
+    fetch['fetch_batch'] = fail
+    frames = fetch['fetch_sheets'](['분양', '인구'])
+    assert sorted(frames) == ['분양', '인구']
+    [failure] = fetch['batch_errors']().values()
+    assert failure['names'] == ['분양', '인구']
+    assert 'quota exceeded' in failure['error']
+
+    fetch['fetch_batch'] = lambda key, names: {name: pd.DataFrame() for name in names}
+    fetch['fetch_sheets'](['분양', '인구'])
+    assert fetch['batch_errors']() == {}
+
+
+def test_schema_errors_are_not_swallowed(fetch):
+    def fail(key, names):
+        raise KeyError('분양: 시트 헤더에 없는 컬럼')
+    fetch['fetch_batch'] = fail
+    with pytest.raises(KeyError):
+        fetch['fetch_sheets'](['분양', '인구'])
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from PIL import Image
+
+
+def test_concurrent_thumbnails_share_one_cached_file(app, tmp_path):
+    src = tmp_path / '관저 _thumb.jpg'
+    Image.new('RGB', (2000, 1200), 'navy').save(src)
+    results = []
+
+    def render():
+        # 세션마다 메모리 캐시가 비어 있는 상황 (디스크 캐시 파일만 공유)
+        results.append(app['thumbnail_bytes'].__wrapped__(str(src), os.path.getmtime(src)))
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 8 and len(set(results)) == 1
+    files = os.listdir(app['THUMB_DIR'])
+    assert len(files) == 1 and not files[0].endswith('.tmp')
+    with Image.open(os.path.join(app['THUMB_DIR'], files[0])) as thumb:
+        assert max(thumb.size) == app['THUMB_MAX_PX']
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+
+def put_pairs(app, rows):
+    pairs = pd.DataFrame(rows, columns=['pj', 'pjo'])
+    app['get_sheet_cache']().put('pj_pair', pairs, app['SHEETS']['pj_pair']['ttl'])
+
+
+def test_blank_option_cell_is_not_a_pair(app):
+    # 시트의 빈 셀은 결측(NaN)으로 들어온다
+    put_pairs(app, [['A', 'A옵션'], ['B', np.nan], ['C', '  '], [np.nan, 'D옵션']])
+    assert app['pair_frame']().values.tolist() == [['A', 'A옵션']]
+    assert app['option_projects']('B') == []
+    assert app['main_project']('D옵션') == 'D옵션'
+
+
+def test_one_main_project_with_several_options(app):
+    put_pairs(app, [['A', 'A옵션1'], ['A', ' A옵션2 '], ['A', 'A옵션1']])
+    assert app['option_projects']('A') == ['A옵션1', 'A옵션2']
+    assert app['main_project']('A옵션2') == 'A'
+
+
+def test_concurrent_saves_of_the_same_pair_queue_it_once(app, tmp_path):
+    put_pairs(app, [['A', 'A옵션']])
+    index = app['pair_index']
+
+    def slow_index():
+        time.sleep(0.05)  # 시트를 새로 읽는 중
+        return index()
+    app['pair_index'] = slow_index
+    queue = app['PairQueue'](str(tmp_path / 'queue.csv'))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(queue.add('B', 'B옵션'))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [False, False, False, True]
+    assert queue.pending() == [('B', 'B옵션')]
+
+
+def test_resumed_queue_does_not_resend_rows_already_in_the_sheet(app, tmp_path):
+    path = tmp_path / 'queue.csv'
+    path.write_text('A,A옵션\nB,B옵션\n', encoding='utf-8')  # A는 반영 직후 종료되어 파일에 남은 행
+    sheet = pd.DataFrame({'pj': ['A'], 'pjo': ['A옵션']})
+    app['dataset_frame'] = lambda name: sheet
+    sent = []
+    app['get_worksheet'] = lambda key, title: types.SimpleNamespace(append_rows=sent.extend)
+    queue = app['PairQueue'](str(path))
+    queue.flush()
+    assert sent == [['B', 'B옵션']]
+    assert queue.pending() == []
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+
+def test_pnl_total_counts_option_rows_once(app):
+    # 옵션공사 이름이 본공사 이름을 포함하거나 정규식 특수문자가 있어도 정확히 그 내역만 더한다
+    sheet = pd.DataFrame({'프로젝트': ['X', 'X', 'X'], '프로젝트 내역': ['X', 'X옵션', 'X(2차)'],
+                          '기준월': ['2025-01'] * 3, '당월매출': [100, 30, 5]})
+    app['get_sheet_cache']().put('alv', app['build_alv_wide'](sheet), app['SHEETS']['alv']['ttl'])
+    main = app['pnl_matrix']('2025-01', 'X')
+    option = app['pnl_matrix']('2025-01', 'X옵션')
+    assert main.loc[('X', '당월'), '매출'] == 100
+    assert app['pnl_matrix']('2025-01', 'X(2차)').loc[('X', '당월'), '매출'] == 5
+    assert app['pnl_total']([main, option]).loc[('합계', '당월'), '매출'] == 130
+
+
+def test_project_match_ignores_case_and_padding_only(app):
+    # pj_pair에 손으로 적은 옵션공사 이름은 대소문자/앞뒤 공백이 alv와 다를 수 있다
+    sheet = pd.DataFrame({'프로젝트': ['X', 'X'], '프로젝트 내역': ['Xa Opt', ' XA OPT2'],
+                          '기준월': ['2025-01'] * 2, '당월매출': [30, 7]})
+    app['get_sheet_cache']().put('alv', app['build_alv_wide'](sheet), app['SHEETS']['alv']['ttl'])
+    assert app['pnl_matrix']('2025-01', ' xa opt ').loc[('X', '당월'), '매출'] == 30
+    assert app['pnl_matrix']('2025-01', 'XA OPT2').loc[('X', '당월'), '매출'] == 7
+    assert app['pnl_matrix']('2025-01', 'Xa').empty  # 부분 일치는 찾지 않음
+    assert app['alv_long']('2025-01', ['xa opt2'])['값'].tolist() == [7]
+
+
+def test_items_are_classified_once_per_column(app):
+    sheet = pd.DataFrame({'프로젝트': ['X', 'Y'], '프로젝트 내역': ['X', 'Y'], '기준월': ['2025-01'] * 2,
+                          '당월매출': [100, 50], '누계매원': [60, 20], '비고금액': [1, 1]})
+    app['get_sheet_cache']().put('alv', app['build_alv_wide'](sheet), app['SHEETS']['alv']['ttl'])
+    calls = []
+    classify = app['classify_alv_items']
+    app['classify_alv_items'] = lambda items: calls.append(list(items)) or classify(items)
+
+    app['pnl_cube']()
+    app['pnl_matrix']('2025-01', 'X')
+    assert calls == [['당월매출', '누계매원', '비고금액']]  # 분류표를 만들 때 한 번
+
+    labels = app['alv_item_labels'](['누계매원', '연간매출'])  # 표에 없는 컬럼만 새로 분류
+    assert calls[-1] == ['연간매출']
+    assert labels['기간기준'].tolist() == ['누계', '금년'] and labels['항목기준'].tolist() == ['매원', '매출']
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+
+def sales_sheet():
+    """두 사업(하위 단지 포함)의 분양 단위 원본. 소송/계약여부2는 빈 셀이 섞여 있음"""
+    rows = [
+        # 사업명, 상품, 동호수, 계약여부, 완납여부, 소송, 총분양금, 입주증번호, 계약월
+        ('X', '아파트', '101-101', '계약', '완납', np.nan, '500,000,000', '1', '2024-01-05'),
+        ('X', '아파트', '101-102', '계약', '미완납', '소송', '520,000,000', '0', '2024-02-10'),
+        ('X', '아파트', '101-103', '미계약', '미완납', np.nan, '510,000,000', '0', np.nan),
+        ('X', '상가', '1-01', '계약', '완납', np.nan, '900,000,000', '1', '2024-01-20'),
+        ('X 2단지', '아파트', '201-101', '계약', '미완납', np.nan, '450,000,000', '0', '2024-03-01'),
+        ('Y', '오피스텔', '1-1001', '미계약', '미완납', np.nan, '300,000,000', '0', np.nan),
+    ]
+    raw = pd.DataFrame(rows, columns=['사업명', '상품', '동호수', '계약여부', '완납여부', '소송', '총분양금', '입주증번호', '계약월'])
+    return raw.assign(계약여부2=np.nan, 완납월=raw['계약월'])
+
+
+def load_sales(app):
+    app['fetch_sheets'] = lambda names: {n: sales_sheet() for n in names}
+    df = app['refresh_snapshots'](['분양'])['분양'][0].drop(columns=app['ROW_HASH'])
+    app['get_sheet_cache']().put('분양', df, 60)
+    return df
+
+
+def test_cube_share_table_matches_the_row_level_pivot(app):
+    data = load_sales(app)
+    cube = app['sales_cube'](data[data['사업명'] == 'X'])
+    table = app['share_table'](cube, '계약여부', '세대', '공급', ['계약', '미계약']).set_index('상품')
+    assert table.loc['아파트', ['공급', '계약', '미계약', '계약(%)']].tolist() == [3, 2, 1, 67]
+    assert table.loc['상가', ['공급', '계약', '미계약']].tolist() == [1, 1, 0]
+    assert table.index.tolist() == ['아파트', '상가']  # 공급 내림차순
+
+
+def test_cube_keeps_blank_keys_and_sums_amounts_exactly(app):
+    cube = app['sales_cube'](load_sales(app), by=['사업명'])
+    assert cube['세대'].sum() == 6
+    assert cube['총분양금'].sum() == 3_180_000_000
+    assert cube['총분양금'].dtype == 'int64'
+    assert cube.loc[cube['소송'] == '소송', '세대'].sum() == 1
+    assert cube['소송'].isna().sum() > 0  # 빈 소송 값도 행으로 남음
+
+
+def test_project_lookup_groups_sub_sites_like_the_old_search(app):
+    load_sales(app)
+    assert app['project_sales']('X')['세대'].sum() == 5  # X + X 2단지
+    assert app['project_sales']('x 2단지')['세대'].sum() == 1
+    assert app['project_sales'](app['ALL_PROJECTS'])['세대'].sum() == 6
+    assert app['project_sales']('Z').empty
+
+
+def test_project_trend_uses_the_same_grouping(app):
+    load_sales(app)
+    trend = app['project_trend']('X')
+    apartments = trend[trend['상품'] == '아파트'].iloc[-1]
+    assert (apartments['누적계약'], apartments['총공급']) == (3, 4)
+    assert app['project_trend']('Z').empty
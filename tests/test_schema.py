@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from conftest import load_app
+
+
+def cash_sheet(months=12):
+    """금액이 모두 작은 정수라 int8로 줄어드는 자금수지 원본 (누계는 int8 범위를 넘음)"""
+    return pd.DataFrame({'수지구분': '영업수지', '사업명': 'A', '기준월': '2025-01',
+                         '구분': '분양수입', '집행월': pd.date_range('2025-01-01', periods=months, freq='MS').astype(str),
+                         '금액': ['100'] * months})
+
+
+def refresh(app, name, raw):
+    app['fetch_sheets'] = lambda names: {n: raw for n in names}
+    return app['refresh_snapshots']([name])[name][0]
+
+
+def test_amounts_are_compacted_in_the_cache_but_int64_for_menus(app):
+    df = refresh(app, '자금수지', cash_sheet())
+    assert df['금액'].dtype == 'int8'
+    app['get_sheet_cache']().put('자금수지', df, 60)
+    menu = app['load_sheet']('자금수지')
+    assert menu['금액'].dtype == 'int64'
+    menu.loc[0, '금액'] = 0
+    assert df.loc[0, '금액'] == 100  # 사본
+
+
+def test_derived_totals_do_not_wrap(app):
+    app['get_sheet_cache']().put('자금수지', refresh(app, '자금수지', cash_sheet()), 60)
+    balance = app['cash_balance']('A', '2025-01')
+    assert balance.iloc[-1] == 1200
+
+
+def test_memory_report_is_filled_from_snapshots_after_restart(app, tmp_path):
+    refresh(app, '인구', pd.DataFrame({'기준월': ['2025-01'] * 3, '총인구수': ['1,000'] * 3, '세대수': ['400'] * 3,
+                                      '남자 인구수': ['500'] * 3, '여자 인구수': ['500'] * 3}))
+    raw_bytes = app['memory_report']()['인구']['원본']
+
+    restarted = load_app(tmp_path)  # 같은 snapshot/ 폴더를 쓰는 새 프로세스
+    restarted['load_from_source']('인구')
+    report = restarted['memory_report']()['인구']
+    assert report['원본'] == raw_bytes
+    assert 0 < report['압축'] < raw_bytes
+
+
+def test_pnl_arithmetic_on_compacted_alv_does_not_wrap(app):
+    sheet = pd.DataFrame({'프로젝트': ['P'], '프로젝트 내역': ['P'], '기준월': ['2025-01'],
+                          '당월매출': ['100'], '당월매원': ['-100']})  # 둘 다 int8로 줄어듦
+    refresh(app, 'alv', sheet)  # 스냅샷에서 가로형으로 적재
+    assert app['pnl_matrix']('2025-01', 'P').loc[('P', '당월'), '매출이익'] == 200
+
+
+def test_alv_is_cached_once_in_wide_form(app):
+    sheet = pd.DataFrame({'프로젝트': ['P'] * 4, '프로젝트 내역': ['P', 'P', 'P옵션', 'P'],
+                          '기준월': ['2025-01', '2025-02', '2025-01', '2025-03'],
+                          '당월매출': ['100', '50', '7', '1'], '누계매원': ['3', '4', '5', '6']})
+    refresh(app, 'alv', sheet)
+    wide = app['alv_wide']()
+    cache = app['get_sheet_cache']()
+    assert cache.lookup('alv')[0] is wide and cache.lookup('alv_wide')[0] is None
+    assert list(wide.index.names) == app['ALV_BASE_COLS'] and wide['당월매출'].dtype == 'int8'
+    report = app['memory_report']()
+    assert report['alv_wide']['원본'] == report['alv']['압축'] and report['alv_wide']['압축'] > 0
+
+    long = app['alv_long']('2025-01', ['P'])
+    assert long['항목'].tolist() == ['당월매출', '누계매원'] and long['값'].tolist() == [100, 3]
+    assert long['값'].dtype == 'int64' and long['항목기준'].tolist() == ['매출', '매원']
+    assert len(app['alv_long']()) == 8
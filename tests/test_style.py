@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_number_strings_match_python_formatting(app):
+    values = np.array([0, 1, -1, 999, 1000, -1000, 1234567.5, 2.5, 3.5, -999999.49, 12345678901.0])
+    assert app['number_strings'](values).tolist() == [f'{v:,.0f}' for v in values]
+    assert app['number_strings'](np.array([1.25, np.nan]), '.1f').tolist() == ['1.2', '']
+    assert app['number_strings'](np.array([0.0, 5.0]), blank_zero=True).tolist() == ['', '5']
+
+
+def test_format_matrix_formats_numeric_columns_only(app):
+    df = pd.DataFrame({'상품': ['아파트', None], '공급': [1200, 30], '계약(%)': [66.7, np.nan]})
+    out = app['format_matrix'](df, formats={'계약(%)': '.1f'})
+    assert out.values.tolist() == [['아파트', '1,200', '66.7'], ['', '30', '']]
+
+
+def test_style_rules_combine_in_order(app):
+    df = pd.DataFrame({'구분': ['약정원금', '납부원금'], '2024-01': [1, 2], '2024-02': [3, 4], '합계': [4, 6]},
+                      index=['소계', 'x'])
+    rules = [{'months_until': pd.Timestamp('2024-01-31'), 'css': 'color: gray;', 'else': 'color: white;'},
+             {'where': ('구분', ['납부원금']), 'css': 'color: lightyellow;'},
+             {'rows': ['소계'], 'css': 'background-color: black;'},
+             {'cols': ['합계'], 'css': 'font-weight: bold;'}]
+    css = app['style_matrix'](df, rules)
+    assert css.loc['소계', '2024-01'] == 'color: gray;background-color: black;'
+    assert css.loc['x', '2024-02'] == 'color: white;color: lightyellow;'  # 뒤 규칙이 우선
+    assert css.loc['x', '합계'] == 'color: lightyellow;font-weight: bold;'
+    assert css.loc['x', '구분'] == 'color: lightyellow;'
+
+
+def test_render_table_applies_css_to_display_strings(app):
+    pytest.importorskip('jinja2')
+    df = pd.DataFrame({'v': [1000, 2]}, index=['영업이익', '매출'])
+    html = app['style_table'](df, [app['ROW_HIGHLIGHT']]).to_html()
+    assert '1,000' in html
+    assert html.count('background-color: black') == 1
+
+
+def test_styled_table_follows_a_sheet_refresh(app):
+    app['get_prefetch_executor'] = lambda: type('Inline', (), {'submit': lambda self, fn, *args: fn(*args)})()
+    cache = app['get_sheet_cache']()
+    cache.put('raw', pd.DataFrame({'v': [1]}), 60)
+    monthly = lambda: app['cached_frame']('raw_월별', lambda: cache.get('raw') * 1000, 60, source='raw')
+    table = lambda: app['cached_table']('raw_월별|표', monthly, 60, source='raw_월별')
+    assert table().data['v'].tolist() == ['1,000']
+
+    cache.put('raw', pd.DataFrame({'v': [2]}), 60)
+    assert cache.info('raw_월별|표')['stale']
+    table()  # 만료된 표를 보여주며 뒤에서 다시 만듦
+    assert table().data['v'].tolist() == ['2,000']